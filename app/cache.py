@@ -0,0 +1,545 @@
+from __future__ import annotations
+
+import datetime as dt
+import functools
+import inspect
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import pandas as pd
+
+# Support running as package (app.*) or script (local modules)
+try:
+    from app.settings import setting  # type: ignore
+    from app.shared_cache import SharedTier, decode, encode, make_backend  # type: ignore
+except ModuleNotFoundError:
+    from settings import setting  # type: ignore
+    from shared_cache import SharedTier, decode, encode, make_backend  # type: ignore
+
+# Partition names: ranges ending before today are closed history, anything touching today is live
+PARTITION_HISTORY = "history"
+PARTITION_TODAY = "today"
+
+_MISSING = object()
+
+# Set while refresh_due() recomputes an entry: nested cached loaders then
+# recompute their today entries instead of reading the about-to-expire ones
+_refreshing = threading.local()
+
+# After a shared-tier failure the backend is skipped for this many seconds
+SHARED_RETRY_S = 30.0
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_setting(key: str, env: str, default: str) -> str:
+    """Read an optional setting from the `cache` secrets block, then the environment."""
+    return setting("cache", key, env, default)
+
+
+def _sizeof(value: Any) -> int:
+    """Approximate in-memory size of a cached value in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 1024
+
+
+class ResultCache:
+    """Process-wide LRU cache of query results shared by all sessions.
+
+    Entries carry their own TTL and a partition tag so closed history can be
+    kept for hours while ranges touching today expire quickly, and the refresh
+    button can drop only the today partition. Total size is capped at
+    ``max_bytes``; least recently used entries are evicted first.
+
+    Cached values are shared between sessions and must be treated as read-only.
+
+    With a ``shared`` tier (see shared_cache) the cache is the local first
+    level of a two-level cache: every put() is also written, compressed and
+    with the same TTL, to the shared backend, and a local miss is looked up
+    there before the caller recomputes, so several app processes or nodes
+    share one cached copy. Invalidation is forwarded to the backend by
+    partition and day tags. Backend failures are logged and count as misses;
+    reads and writes then bypass the backend for SHARED_RETRY_S seconds
+    (invalidations are always attempted).
+    """
+
+    def __init__(self, max_bytes: int = 256 << 20, today_ttl: float = 60.0,
+                 history_ttl: Optional[float] = 24 * 3600.0, shared: Optional[SharedTier] = None):
+        self.max_bytes = max_bytes
+        self.today_ttl = today_ttl
+        self.history_ttl = history_ttl
+        self.shared = shared
+        self._lock = threading.RLock()
+        # key -> (value, size, expires_at or None, partition, (first_day, last_day) or None)
+        self._entries: OrderedDict[Hashable, tuple[Any, int, Optional[float], str, Optional[tuple[str, str]]]] = OrderedDict()
+        # Today entries that can be recomputed in the background, and when each key was last read
+        self._refreshers: dict[Hashable, Callable[[], Any]] = {}
+        self._last_hit: dict[Hashable, float] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.shared_hits = 0
+        self.shared_errors = 0
+        self._shared_retry_at = 0.0
+
+    def partition_for(self, date_to: str) -> str:
+        return PARTITION_TODAY if date_to >= dt.date.today().isoformat() else PARTITION_HISTORY
+
+    def ttl_for(self, partition: str) -> Optional[float]:
+        return self.today_ttl if partition == PARTITION_TODAY else self.history_ttl
+
+    def get(self, key: Hashable, refresh: Optional[Callable[[], Any]] = None) -> Any:
+        """Cached value or _MISSING; ``refresh`` is attached to an entry filled from the shared tier."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, _, expires_at, _, _ = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._last_hit[key] = time.monotonic()
+                    self.hits += 1
+                    return value
+                self._drop(key)
+            self.misses += 1
+        if not self._shared_available():
+            return _MISSING
+        return self._shared_get(key, refresh)
+
+    def put(self, key: Hashable, value: Any, partition: str, span: Optional[tuple[str, str]] = None,
+            refresh: Optional[Callable[[], Any]] = None) -> None:
+        """Store ``value``; ``span`` is the (first, last) ISO day range it covers, for invalidate_days().
+
+        ``refresh`` recomputes the value; today entries that have it can be
+        renewed ahead of expiry by refresh_due().
+        """
+        ttl = self.ttl_for(partition)
+        self._store(key, value, partition, span, refresh, ttl)
+        if self._shared_available():
+            self._shared_put(key, value, partition, span, ttl)
+
+    def _store(self, key: Hashable, value: Any, partition: str, span: Optional[tuple[str, str]],
+               refresh: Optional[Callable[[], Any]], ttl: Optional[float]) -> None:
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            last_hit = self._last_hit.get(key)
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, expires_at, partition, span)
+            self._bytes += size
+            if last_hit is not None:
+                self._last_hit[key] = last_hit
+            if refresh is not None and partition == PARTITION_TODAY:
+                self._refreshers[key] = refresh
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _shared_get(self, key: Hashable, refresh: Optional[Callable[[], Any]]) -> Any:
+        try:
+            payload = self.shared.backend.get(self.shared.key(key))
+            if payload is None:
+                return _MISSING
+            value, expires_at, meta = decode(payload)
+        except Exception:
+            self._shared_failed("read")
+            return _MISSING
+        # Keep the local copy only for the remaining shared lifetime
+        ttl = expires_at - time.time() if expires_at is not None else None
+        if ttl is not None and ttl <= 0:
+            return _MISSING
+        span = tuple(meta["span"]) if meta.get("span") else None
+        self._store(key, value, meta["partition"], span, refresh, ttl)
+        with self._lock:
+            self.shared_hits += 1
+        return value
+
+    def _shared_put(self, key: Hashable, value: Any, partition: str, span: Optional[tuple[str, str]],
+                    ttl: Optional[float]) -> None:
+        tags = [self.shared.tag(f"part:{partition}")]
+        if span is not None:
+            tags += [self.shared.tag(f"day:{day}") for day in _days(*span)]
+        try:
+            payload = encode(value, time.time() + ttl if ttl is not None else None,
+                             {"partition": partition, "span": span})
+            self.shared.backend.set(self.shared.key(key), payload, ttl, tags)
+        except Exception:
+            self._shared_failed("write")
+
+    def _shared_invalidate(self, tags: list[str]) -> None:
+        try:
+            for tag in tags:
+                self.shared.backend.invalidate_tag(self.shared.tag(tag))
+        except Exception:
+            self._shared_failed("invalidation")
+
+    def _shared_available(self) -> bool:
+        return self.shared is not None and time.monotonic() >= self._shared_retry_at
+
+    def _shared_failed(self, action: str) -> None:
+        logger.warning("shared cache %s failed; bypassing %s for %.0fs", action,
+                       type(self.shared.backend).__name__, SHARED_RETRY_S, exc_info=True)
+        with self._lock:
+            self.shared_errors += 1
+            self._shared_retry_at = time.monotonic() + SHARED_RETRY_S
+
+    def invalidate(self, partition: Optional[str] = None) -> int:
+        """Drop every entry in ``partition`` (all entries when None); returns the count dropped."""
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if partition is None or e[3] == partition]
+            for k in keys:
+                self._drop(k)
+        if self.shared is not None:
+            parts = [partition] if partition is not None else [PARTITION_TODAY, PARTITION_HISTORY]
+            self._shared_invalidate([f"part:{p}" for p in parts])
+        return len(keys)
+
+    def invalidate_today(self) -> int:
+        return self.invalidate(PARTITION_TODAY)
+
+    def invalidate_days(self, days: set[str]) -> int:
+        """Drop entries whose day span covers any of ``days`` (entries without a span are kept)."""
+        with self._lock:
+            keys = [
+                k for k, e in self._entries.items()
+                if e[4] is not None and any(e[4][0] <= day <= e[4][1] for day in days)
+            ]
+            for k in keys:
+                self._drop(k)
+        if self.shared is not None:
+            self._shared_invalidate([f"day:{day}" for day in sorted(days)])
+        return len(keys)
+
+    def refresh_due(self, ahead: float, hot_window: float) -> int:
+        """Recompute hot today entries that expire within ``ahead`` seconds; returns the count renewed.
+
+        An entry is hot if it was read in the last ``hot_window`` seconds. The
+        new value replaces the old one in a single put(), so readers see either
+        the previous or the refreshed value and never a miss. Cached loaders
+        called by a refresh recompute (and re-store) their today entries, so a
+        derived entry is never renewed from its inputs' stale values.
+        """
+        now = time.monotonic()
+        with self._lock:
+            due = [
+                (k, self._refreshers[k], e[3], e[4])
+                for k, e in self._entries.items()
+                if k in self._refreshers and e[2] is not None and e[2] - now <= ahead
+                and now - self._last_hit.get(k, float("-inf")) <= hot_window
+            ]
+        renewed = 0
+        for key, refresh, partition, span in due:
+            _refreshing.active = True
+            try:
+                value = refresh()
+            except Exception:
+                logger.exception("background refresh of %r failed", key)
+                continue
+            finally:
+                _refreshing.active = False
+            self.put(key, value, partition, span=span, refresh=refresh)
+            renewed += 1
+        with self._lock:
+            self.refreshes += renewed
+        return renewed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "refreshes": self.refreshes,
+                "shared_backend": type(self.shared.backend).__name__ if self.shared is not None else None,
+                "shared_hits": self.shared_hits,
+                "shared_errors": self.shared_errors,
+            }
+
+    def _drop(self, key: Hashable) -> None:
+        _, size, _, _, _ = self._entries.pop(key)
+        self._refreshers.pop(key, None)
+        self._last_hit.pop(key, None)
+        self._bytes -= size
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls into one execution.
+
+    The first caller for a key runs the function; callers arriving while
+    it is in flight wait and receive the same result (or exception). Once
+    it finishes the key is released, so later calls run again; caching
+    stays the caller's job. Shared results must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+                flight.waiters += 1
+                self.max_waiters = max(self.max_waiters, flight.waiters)
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = fn()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "executed": self.calls - self.coalesced,
+                "in_flight": len(self._flights),
+                "max_waiters": self.max_waiters,
+            }
+
+
+@functools.lru_cache(maxsize=1)
+def get_cache() -> ResultCache:
+    """Shared cache configured from the `cache` secrets block or CACHE_* env vars.
+
+    Keys: max_mb (CACHE_MAX_MB), today_ttl (CACHE_TODAY_TTL, seconds),
+    history_ttl (CACHE_HISTORY_TTL, seconds; 0 keeps history until evicted),
+    backend (CACHE_BACKEND: "memory", "disk" or "redis" for a shared second
+    level; unset for none), backend_url (CACHE_BACKEND_URL, e.g.
+    redis://host:6379/0), backend_dir (CACHE_BACKEND_DIR), backend_max_mb
+    (CACHE_BACKEND_MAX_MB, memory/disk backends), namespace
+    (CACHE_NAMESPACE, key prefix; give deployments on one server their own).
+    """
+    history_ttl = float(_cache_setting("history_ttl", "CACHE_HISTORY_TTL", str(24 * 3600)))
+    backend = make_backend(
+        _cache_setting("backend", "CACHE_BACKEND", ""),
+        url=_cache_setting("backend_url", "CACHE_BACKEND_URL", "").strip(),
+        directory=_cache_setting("backend_dir", "CACHE_BACKEND_DIR", "").strip(),
+        max_bytes=int(float(_cache_setting("backend_max_mb", "CACHE_BACKEND_MAX_MB", "1024")) * (1 << 20)),
+    )
+    namespace = _cache_setting("namespace", "CACHE_NAMESPACE", "production-dashboard").strip()
+    return ResultCache(
+        max_bytes=int(float(_cache_setting("max_mb", "CACHE_MAX_MB", "256")) * (1 << 20)),
+        today_ttl=float(_cache_setting("today_ttl", "CACHE_TODAY_TTL", "60")),
+        history_ttl=history_ttl or None,
+        shared=SharedTier(backend, namespace) if backend is not None else None,
+    )
+
+
+def _cached(cache: ResultCache, key: Hashable, partition: str, refresh: Callable[[], Any]) -> Any:
+    """cache.get(), except that today entries are reported missing during a background refresh."""
+    if partition == PARTITION_TODAY and getattr(_refreshing, "active", False):
+        return _MISSING
+    return cache.get(key, refresh=refresh)
+
+
+def cached_query(fn: Callable) -> Callable:
+    """Cache a loader whose arguments include ``date_from``/``date_to`` (ISO strings) in get_cache().
+
+    The result is keyed on the function and its bound arguments; the TTL comes
+    from whether the range ends before today.
+    """
+    sig = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        bound = sig.bind(*args, **kwargs)
+        bound.apply_defaults()
+        call = bound.arguments
+        date_to = call.get("date_to") or call["date_from"]
+        key = (fn.__module__, fn.__qualname__, tuple(call.items()))
+        cache = get_cache()
+
+        def refresh():
+            return fn(*args, **kwargs)
+
+        partition = cache.partition_for(date_to)
+        value = _cached(cache, key, partition, refresh)
+        if value is _MISSING:
+            value = fn(*args, **kwargs)
+            cache.put(key, value, partition, span=(call["date_from"], date_to), refresh=refresh)
+        return value
+
+    return wrapper
+
+
+def _days(date_from: str, date_to: str) -> list[str]:
+    start, end = dt.date.fromisoformat(date_from), dt.date.fromisoformat(date_to)
+    return [(start + dt.timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+def _runs(days: list[str]) -> list[tuple[str, str]]:
+    """Group ISO days into contiguous (first, last) runs."""
+    runs: list[tuple[str, str]] = []
+    for day in days:
+        if runs and dt.date.fromisoformat(day) - dt.date.fromisoformat(runs[-1][1]) == dt.timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+
+def _concat_days(parts: list[pd.DataFrame]) -> pd.DataFrame:
+    non_empty = [p for p in parts if not p.empty]
+    if not non_empty:
+        return parts[0] if parts else pd.DataFrame()
+    out = pd.concat(non_empty, ignore_index=True)
+    # Per-day frames carry their own categories; restore category dtype after concat
+    for col in non_empty[0].columns:
+        if isinstance(non_empty[0][col].dtype, pd.CategoricalDtype) and not isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype("category")
+    return out
+
+
+def _split_days(df: pd.DataFrame, first: str, last: str) -> dict[str, pd.DataFrame]:
+    """Per-day parts of ``df`` for every day in first..last (empty frames for days without rows)."""
+    if df.empty:
+        by_day = {}
+    else:
+        day_keys = pd.to_datetime(df["production_date"]).dt.strftime("%Y-%m-%d")
+        by_day = {day: part.reset_index(drop=True) for day, part in df.groupby(day_keys, sort=False)}
+    return {day: by_day.get(day, df.iloc[0:0]) for day in _days(first, last)}
+
+
+def cached_by_day(fn: Callable[..., pd.DataFrame]) -> Callable[..., pd.DataFrame]:
+    """Cache a DataFrame loader per production_date in get_cache().
+
+    ``fn(date_from, date_to, ...)`` must return a frame with a ``production_date``
+    column. For a requested range only the days not yet cached are fetched,
+    one query per contiguous run of missing days, and the result is split back
+    into per-day entries; days without rows are cached as empty frames.
+    """
+    sig = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        bound = sig.bind(*args, **kwargs)
+        bound.apply_defaults()
+        call = dict(bound.arguments)
+        date_from = call.pop("date_from")
+        date_to = call.pop("date_to") or date_from
+        rest = tuple(call.items())
+        cache = get_cache()
+
+        def key(day: str) -> tuple:
+            return (fn.__module__, fn.__qualname__, day, rest)
+
+        def fetch_day(day: str) -> pd.DataFrame:
+            return _split_days(fn(day, day, **call), day, day)[day]
+
+        days = _days(date_from, date_to)
+        found = {
+            day: _cached(cache, key(day), cache.partition_for(day), functools.partial(fetch_day, day))
+            for day in days
+        }
+        missing = [day for day in days if found[day] is _MISSING]
+
+        for first, last in _runs(missing):
+            for day, part in _split_days(fn(first, last, **call), first, last).items():
+                cache.put(key(day), part, cache.partition_for(day), span=(day, day),
+                          refresh=functools.partial(fetch_day, day))
+                found[day] = part
+        return _concat_days([found[day] for day in days])
+
+    return wrapper
+
+
+class CacheRefresher(threading.Thread):
+    """Background stale-while-revalidate loop for the today partition.
+
+    Every ``interval_s`` seconds it renews today entries that were read in
+    the last ``hot_window_s`` seconds and expire within ``ahead_s`` seconds,
+    so viewers of the live dashboard keep hitting a warm cache and the
+    database sees one steady refresh per hot key instead of a burst of
+    misses at expiry.
+    """
+
+    def __init__(self, cache: ResultCache, ahead_s: float = 10.0, hot_window_s: float = 300.0, interval_s: float = 2.0):
+        super().__init__(name="cache-refresher", daemon=True)
+        self.cache = cache
+        self.ahead_s = ahead_s
+        self.hot_window_s = hot_window_s
+        self.interval_s = interval_s
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval_s):
+            try:
+                self.cache.refresh_due(self.ahead_s, self.hot_window_s)
+            except Exception:
+                logger.exception("cache refresh pass failed")
+
+
+_refresher: Optional[CacheRefresher] = None
+_refresher_lock = threading.Lock()
+
+
+def start_refresher() -> Optional[CacheRefresher]:
+    """Start the process-wide refresher once (unless disabled); returns it or None.
+
+    Keys in the `cache` block (env fallback): background_refresh (CACHE_BACKGROUND_REFRESH),
+    refresh_ahead (CACHE_REFRESH_AHEAD, seconds, capped at half the today TTL),
+    refresh_hot_window (CACHE_REFRESH_HOT_WINDOW, seconds).
+    """
+    global _refresher
+    if _cache_setting("background_refresh", "CACHE_BACKGROUND_REFRESH", "true").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    with _refresher_lock:
+        if _refresher is None or not _refresher.is_alive():
+            cache = get_cache()
+            ahead = min(float(_cache_setting("refresh_ahead", "CACHE_REFRESH_AHEAD", "10")), cache.today_ttl / 2)
+            _refresher = CacheRefresher(
+                cache,
+                ahead_s=ahead,
+                hot_window_s=float(_cache_setting("refresh_hot_window", "CACHE_REFRESH_HOT_WINDOW", "300")),
+                interval_s=max(0.5, min(2.0, ahead / 2)),
+            )
+            _refresher.start()
+        return _refresher
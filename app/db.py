@@ -1,12 +1,43 @@
 from __future__ import annotations
 
+import datetime as dt
 import os
+import threading
+import time
+from contextlib import contextmanager
 from functools import lru_cache
-from typing import Optional
+from typing import IO, Iterator, Optional
 
 import re
+import numpy as np
+import pandas as pd
 from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# Support running as package (app.*) or script (local modules)
+try:
+    from app.cache import SingleFlight  # type: ignore
+    from app.frame_index import FrameIndex  # type: ignore
+    from app.settings import setting  # type: ignore
+except ModuleNotFoundError:
+    from cache import SingleFlight  # type: ignore
+    from frame_index import FrameIndex  # type: ignore
+    from settings import setting  # type: ignore
+
+# SQLSTATEs for "relation does not exist" and "canceling statement" (statement_timeout)
+_UNDEFINED_TABLE = "42P01"
+_QUERY_CANCELED = "57014"
+
+# (engine, schema) -> whether the rollup tables exist
+_rollup_status: dict[tuple[Engine, str], bool] = {}
+
+# Identical concurrent queries (same SQL incl. schema-qualified table, same params) share one execution
+_flights = SingleFlight()
+
+# Cumulative time spent waiting for a pooled connection in _connect()
+_checkout_lock = threading.Lock()
+_checkout_stats = {"checkouts": 0, "wait_total_s": 0.0, "wait_max_s": 0.0}
 
 
 def _build_conn_str() -> str:
@@ -40,11 +71,99 @@ def _build_conn_str() -> str:
     raise RuntimeError("Database configuration not found. Provide .streamlit/secrets.toml or PG* env vars.")
 
 
+def _pg_setting(key: str, env: str, default: Optional[str] = None):
+    """Read an optional setting from the `postgres` secrets block, then the environment."""
+    return setting("postgres", key, env, default)
+
+
+def _session_settings() -> dict:
+    """Server session settings applied on connect: application_name and optional statement_timeout (ms)."""
+    settings = {"application_name": str(_pg_setting("application_name", "PGAPPNAME", "production-dashboard"))}
+    statement_timeout = _pg_setting("statement_timeout", "PGSTATEMENTTIMEOUT")
+    if statement_timeout:
+        settings["statement_timeout"] = str(int(statement_timeout))
+    return settings
+
+
+def _lift_statement_timeout(conn: Connection) -> None:
+    """Replace the page statement_timeout for the rest of ``conn``'s transaction.
+
+    COPY exports and rollup rebuilds outlast a timeout sized for page queries.
+    Secrets key export_statement_timeout (PGEXPORTSTATEMENTTIMEOUT, ms; default 0 = none).
+    SET LOCAL ends with the transaction, so the pooled connection keeps its own setting.
+    """
+    timeout = int(_pg_setting("export_statement_timeout", "PGEXPORTSTATEMENTTIMEOUT", "0"))
+    conn.execute(text(f"SET LOCAL statement_timeout = {timeout}"))
+
+
+def _pool_options() -> dict:
+    """Pool sizing/health options for create_engine (shared with the async engine).
+
+    Secrets keys (env fallback): pool_size (PGPOOLSIZE), max_overflow (PGMAXOVERFLOW),
+    pool_timeout (PGPOOLTIMEOUT, seconds), pool_recycle (PGPOOLRECYCLE, seconds),
+    pool_pre_ping (PGPOOLPREPING), statement_timeout (PGSTATEMENTTIMEOUT, ms),
+    application_name (PGAPPNAME).
+    """
+    pre_ping = str(_pg_setting("pool_pre_ping", "PGPOOLPREPING", "true")).strip().lower()
+    return {
+        "pool_size": int(_pg_setting("pool_size", "PGPOOLSIZE", "5")),
+        "max_overflow": int(_pg_setting("max_overflow", "PGMAXOVERFLOW", "10")),
+        "pool_timeout": float(_pg_setting("pool_timeout", "PGPOOLTIMEOUT", "30")),
+        "pool_recycle": int(_pg_setting("pool_recycle", "PGPOOLRECYCLE", "300")),
+        "pool_pre_ping": pre_ping in ("1", "true", "yes", "on"),
+    }
+
+
+def _engine_options() -> dict:
+    """Pool and session options for the psycopg2 engine."""
+    settings = _session_settings()
+    connect_args: dict = {"application_name": settings["application_name"]}
+    if "statement_timeout" in settings:
+        connect_args["options"] = f"-c statement_timeout={settings['statement_timeout']}"
+    return {**_pool_options(), "connect_args": connect_args}
+
+
 @lru_cache(maxsize=1)
 def get_engine() -> Engine:
-    return create_engine(_build_conn_str(), pool_pre_ping=True, pool_recycle=300)
+    return create_engine(_build_conn_str(), **_engine_options())
+
+
+def pool_stats() -> dict:
+    """Pool usage snapshot for monitoring: size, checked-out/overflow counts and checkout wait times."""
+    pool = get_engine().pool
+    with _checkout_lock:
+        stats = dict(_checkout_stats)
+    checkouts = stats["checkouts"]
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checked_in": pool.checkedin(),
+        "checkouts": checkouts,
+        "wait_avg_s": stats["wait_total_s"] / checkouts if checkouts else 0.0,
+        "wait_max_s": stats["wait_max_s"],
+    }
 
 
+def coalesce_stats() -> dict:
+    """Single-flight counters: calls, coalesced (served by another caller's query), executed, in_flight."""
+    return _flights.stats()
+
+
+def _query_key(kind: str, sql, params: dict) -> tuple:
+    """Normalized identity of a query: result kind, SQL text and params (lists as tuples)."""
+    norm = tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items()))
+    return (kind, str(sql), norm)
+
+
+def _record_checkout(waited: float) -> None:
+    with _checkout_lock:
+        _checkout_stats["checkouts"] += 1
+        _checkout_stats["wait_total_s"] += waited
+        _checkout_stats["wait_max_s"] = max(_checkout_stats["wait_max_s"], waited)
+
+
+@lru_cache(maxsize=1)
 def _get_schema() -> str:
     """Get target schema from secrets or environment, default 'public'.
     Only allow simple schema names (alnum + underscore) for safety.
@@ -68,24 +187,118 @@ def _table_ident() -> str:
     return f"{_get_schema()}.production_data"
 
 
-def _table_exists(eng: Engine) -> bool:
+NOTIFY_CHANNEL = "production_data_changes"
+
+
+def install_notify_trigger() -> None:
+    """Create/replace the row trigger that NOTIFYs NOTIFY_CHANNEL on production_data writes.
+
+    Payload is JSON {"op", "production_date", "line"}; an UPDATE that moves a row
+    to another date/line notifies both the old and the new key.
+    """
+    schema = _get_schema()
+    table = _table_ident()
+    ddl = f"""
+    CREATE OR REPLACE FUNCTION {schema}.production_data_notify() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP <> 'INSERT' THEN
+            PERFORM pg_notify('{NOTIFY_CHANNEL}', json_build_object(
+                'op', TG_OP, 'production_date', OLD.production_date, 'line', OLD.line)::text);
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            PERFORM pg_notify('{NOTIFY_CHANNEL}', json_build_object(
+                'op', TG_OP, 'production_date', NEW.production_date, 'line', NEW.line)::text);
+        END IF;
+        RETURN NULL;
+    END
+    $$;
+    DROP TRIGGER IF EXISTS production_data_notify ON {table};
+    CREATE TRIGGER production_data_notify
+        AFTER INSERT OR UPDATE OR DELETE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION {schema}.production_data_notify();
+    """
+    with get_engine().begin() as conn:
+        conn.exec_driver_sql(ddl)
+
+
+def notify_trigger_installed() -> bool:
+    """Whether the install_notify_trigger() trigger exists on production_data."""
     sql = text(
         """
-        SELECT 1
-        FROM information_schema.tables
-        WHERE table_schema = :schema AND table_name = 'production_data'
+        SELECT 1 FROM pg_trigger t
+        JOIN pg_class c ON c.oid = t.tgrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relname = 'production_data' AND t.tgname = 'production_data_notify'
         """
     )
-    with eng.connect() as conn:
-        res = conn.execute(sql, {"schema": _get_schema()}).scalar()
-        return bool(res)
+    with get_engine().connect() as conn:
+        return conn.execute(sql, {"schema": _get_schema()}).scalar() is not None
 
 
-def fetch_production(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
-                     category: Optional[list[str]] = None, style_like: Optional[str] = None):
-    """Fetch production rows within date range and optional filters.
+def listen_connection():
+    """Dedicated autocommit DBAPI connection for LISTEN, detached from the engine's pool."""
+    raw = get_engine().raw_connection()
+    raw.detach()
+    dbapi_conn = raw.dbapi_connection
+    dbapi_conn.autocommit = True
+    return dbapi_conn
+
+
+def invalidate_schema_cache() -> None:
+    """Forget the resolved schema and memoized table checks (e.g. after secrets change or a re-import)."""
+    _get_schema.cache_clear()
+    _rollup_status.clear()
+
+
+@contextmanager
+def _connect() -> Iterator[Connection]:
+    """Connection context that reports a missing production_data table as RuntimeError.
+
+    No information_schema probe is issued up front; the main query's own
+    "undefined table" error is translated instead, so the steady state is one round trip.
+    """
+    table = _table_ident()
+    started = time.perf_counter()
+    try:
+        with get_engine().connect() as conn:
+            _record_checkout(time.perf_counter() - started)
+            yield conn
+    except Exception as e:
+        error = _translate_error(e, table)
+        if error is None:
+            raise
+        raise error from e
+
+
+def _translate_error(e: BaseException, table: str) -> Optional[RuntimeError]:
+    """User-facing RuntimeError for pool exhaustion, statement timeout or a missing table; None otherwise.
+
+    Shared by the sync and async (db_async) paths.
+    """
+    if isinstance(e, PoolTimeoutError):
+        return RuntimeError(f"Database busy: no pooled connection available ({e}).")
+    # SQLAlchemy wraps DBAPI errors in .orig; raw cursor errors carry the code directly.
+    # psycopg2 calls it pgcode, asyncpg sqlstate.
+    orig = getattr(e, "orig", e)
+    pgcode = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+    if pgcode == _QUERY_CANCELED:
+        return RuntimeError("Query timed out (statement_timeout). Narrow the date range or filters.")
+    if pgcode != _UNDEFINED_TABLE:
+        return None
+    invalidate_schema_cache()
+    return RuntimeError(
+        f"Table not found: {table}. Import Cloud_SQL_sample_DB.sql or set postgres.schema correctly in secrets."
+    )
+
+
+def _build_filters(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
+                   category: Optional[list[str]] = None, style_like: Optional[str] = None,
+                   styles: Optional[list[str]] = None) -> tuple[str, dict]:
+    """Build the WHERE clause and bind params shared by all production_data queries.
 
     Dates are ISO strings (YYYY-MM-DD). If date_to is None, equals date_from.
+    An explicit style list takes precedence over the style_like substring search.
     """
     if not date_to:
         date_to = date_from
@@ -94,25 +307,787 @@ def fetch_production(date_from: str, date_to: Optional[str] = None, line: Option
     params: dict = {"dfrom": date_from, "dto": date_to}
     if line:
         filters.append("line = ANY(:lines)")
-        params["lines"] = line
+        params["lines"] = list(line)
     if category:
         filters.append("category = ANY(:cats)")
-        params["cats"] = category
-    if style_like:
-        filters.append("style_number ILIKE :style")
-        params["style"] = f"%{style_like}%"
+        params["cats"] = list(category)
+    if styles:
+        filters.append("style_number = ANY(:styles)")
+        params["styles"] = list(styles)
+    elif style_like:
+        # Match the input literally: escape the LIKE wildcards and the escape char itself
+        filters.append("style_number ILIKE :style ESCAPE '\\'")
+        params["style"] = "%" + re.sub(r"([\\%_])", r"\\\1", style_like) + "%"
+    return " AND ".join(filters), params
+
+
+HOUR_COLUMNS = (
+    "t_0830", "t_0930", "t_1000", "t_1130", "t_1330", "t_1430", "t_1530", "t_1630", "t_1730", "t_1800", "overtime",
+)
+
+
+def _execute(sql, params: dict):
+    """Run a query against production_data and return all rows as mappings.
+
+    Identical concurrent calls are coalesced into one query (see coalesce_stats()).
+    """
+    def run():
+        with _connect() as conn:
+            res = conn.execute(sql, params)
+            return res.mappings().all()
+
+    return _flights.do(_query_key("rows", sql, params), run)
+
+
+def fetch_production(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
+                     category: Optional[list[str]] = None, style_like: Optional[str] = None,
+                     styles: Optional[list[str]] = None):
+    """Fetch production rows within date range and optional filters.
+
+    Dates are ISO strings (YYYY-MM-DD). If date_to is None, equals date_from.
+    """
+    sql, params = production_query(date_from, date_to, line, category, style_like, styles)
+    return _execute(sql, params)
+
+
+def production_query(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
+                     category: Optional[list[str]] = None, style_like: Optional[str] = None,
+                     styles: Optional[list[str]] = None):
+    """The row-level SELECT behind fetch_production, as (TextClause, params)."""
+    where_clause, params = _build_filters(date_from, date_to, line, category, style_like, styles)
+    sql = text(
+        f"SELECT * FROM {_table_ident()} WHERE {where_clause} ORDER BY production_date, line, style_number"
+    )
+    return sql, params
+
+
+_CATEGORY_COLUMNS = ("line", "category", "style_number")
+_INT_COLUMNS = HOUR_COLUMNS + ("daily_production_total",)
+
+
+def _batch_column(name: str, values: tuple) -> tuple[np.ndarray, Optional[np.ndarray]]:
+    """Convert one batch of a fetched column to a typed array (plus NULL mask for int columns)."""
+    n = len(values)
+    if name in _INT_COLUMNS:
+        mask = np.fromiter((v is None for v in values), dtype=bool, count=n)
+        data = np.fromiter((0 if v is None else v for v in values), dtype=np.int32, count=n)
+        return data, mask
+    if name == "production_date":
+        return np.array(values, dtype="datetime64[D]"), None
+    if name == "average_hourly":
+        return np.fromiter((np.nan if v is None else float(v) for v in values), dtype=np.float64, count=n), None
+    return np.array(values, dtype=object), None
+
+
+def _finish_column(name: str, parts: list[tuple[np.ndarray, Optional[np.ndarray]]]):
+    """Concatenate per-batch arrays into the final pandas column."""
+    data = np.concatenate([p[0] for p in parts])
+    if name in _INT_COLUMNS:
+        return pd.arrays.IntegerArray(data, np.concatenate([p[1] for p in parts]))
+    if name in _CATEGORY_COLUMNS:
+        return pd.Categorical(data)
+    if data.dtype == object:
+        return pd.Series(data).infer_objects()
+    return data
+
+
+def _smallest_int(values: pd.Series) -> str:
+    lo, hi = values.min(), values.max()
+    if pd.isna(lo) or (lo >= np.iinfo(np.int16).min and hi <= np.iinfo(np.int16).max):
+        return "Int16"
+    return "Int32"
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize a production frame to its compact dtypes (idempotent, returns a new frame).
+
+    line/category/style_number become category, hourly quantities and
+    daily_production_total the smallest nullable integer (Int16/Int32) that
+    holds their range, production_date datetime64 (pandas' smallest unit is
+    seconds, so day precision is stored as datetime64[s]) and id int32 when it fits.
+    """
+    out = df.copy(deep=False)
+    for col in out.columns:
+        values = out[col]
+        if col in _CATEGORY_COLUMNS:
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                out[col] = values.astype("category")
+        elif col in _INT_COLUMNS:
+            values = pd.to_numeric(values) if values.dtype == object else values
+            out[col] = values.astype(_smallest_int(values))
+        elif col == "production_date":
+            if not pd.api.types.is_datetime64_dtype(values):
+                out[col] = pd.to_datetime(values).astype("datetime64[s]")
+        elif col == "id" and len(values) and values.max() <= np.iinfo(np.int32).max:
+            out[col] = values.astype(np.int32)
+    return out
+
+
+def _plain_column(col: str, values: pd.Series) -> pd.Series:
+    """``values`` as the uncompacted driver result would hold them, chosen by dtype kind."""
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype) or col == "production_date":
+        return values.astype(object)
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return values.astype("float64" if values.hasnans else "int64")
+    if pd.api.types.is_float_dtype(dtype):
+        return values.astype("float64")
+    if pd.api.types.is_datetime64_any_dtype(dtype) or pd.api.types.is_timedelta64_dtype(dtype):
+        return values
+    return values.astype(object)
+
+
+def memory_report(df: pd.DataFrame) -> dict:
+    """Measured memory of ``df`` against a plain object/int64/float64 frame of the same rows.
+
+    Returns {"rows", "bytes", "plain_bytes", "ratio", "columns": {name: (bytes, plain_bytes, dtype)}}.
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        used = int(values.memory_usage(index=False, deep=True))
+        plain = _plain_column(col, values)
+        columns[col] = (used, int(plain.memory_usage(index=False, deep=True)), str(values.dtype))
+    used_total = sum(c[0] for c in columns.values())
+    plain_total = sum(c[1] for c in columns.values())
+    return {
+        "rows": len(df),
+        "bytes": used_total,
+        "plain_bytes": plain_total,
+        "ratio": plain_total / used_total if used_total else 1.0,
+        "columns": columns,
+    }
+
+
+def fetch_production_frame(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
+                           category: Optional[list[str]] = None, style_like: Optional[str] = None,
+                           styles: Optional[list[str]] = None, batch_size: int = 5000) -> pd.DataFrame:
+    """Columnar variant of fetch_production returning a typed DataFrame.
+
+    Rows are pulled in batches of ``batch_size`` through a server-side (named) cursor
+    and each batch is converted straight into typed column arrays, skipping
+    RowMapping/dict materialization. The result has the compact_frame() dtypes.
+    Identical concurrent calls share one query and the same (read-only) frame.
+    """
+    sql, params = production_query(date_from, date_to, line, category, style_like, styles)
+
+    def run():
+        with _connect() as conn:
+            return _read_frame(conn, sql, params, batch_size)
+
+    return _flights.do(_query_key("frame", sql, params), run)
+
+
+def _read_frame(conn: Connection, sql, params: dict, batch_size: int = 5000) -> pd.DataFrame:
+    """Run ``sql`` on a named cursor and build a typed DataFrame batch by batch."""
+    compiled = sql.compile(dialect=conn.dialect)
+    dbapi_conn = conn.connection.dbapi_connection
+    with dbapi_conn.cursor(name="fetch_production_frame") as cur:
+        cur.itersize = batch_size
+        cur.execute(str(compiled), compiled.construct_params(params))
+        batch = cur.fetchmany(batch_size)
+        names = [d[0] for d in cur.description]
+        parts: list[list] = [[] for _ in names]
+        while batch:
+            for i, values in enumerate(zip(*batch)):
+                parts[i].append(_batch_column(names[i], values))
+            batch = cur.fetchmany(batch_size)
+    if not parts or not parts[0]:
+        return pd.DataFrame(columns=names)
+    return compact_frame(pd.DataFrame({name: _finish_column(name, p) for name, p in zip(names, parts)}))
+
+
+def fetch_changes(day: str, since: Optional[int] = None) -> tuple[pd.DataFrame, int]:
+    """Rows of one production_date written by transactions at or after watermark ``since``.
+
+    Returns (rows, watermark). The watermark is the xmin of the current snapshot:
+    every transaction older than it has finished, so passing it back as ``since``
+    never misses a row, at the cost of occasionally re-reading a few. With
+    ``since=None`` all rows of the day are returned. Deleted rows are not reported.
+    """
+    table = _table_ident()
+    with _connect() as conn:
+        # xmin is a 32-bit xid; reduce the 64-bit snapshot xmin to the same space
+        watermark = int(conn.execute(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")).scalar())
+        watermark %= 1 << 32
+        if since is None:
+            sql = text(f"SELECT * FROM {table} WHERE production_date = :day ORDER BY line, style_number")
+            params: dict = {"day": day}
+        else:
+            sql = text(
+                f"SELECT * FROM {table} WHERE production_date = :day AND xmin::text::bigint >= :since "
+                "ORDER BY line, style_number"
+            )
+            params = {"day": day, "since": since}
+        return _read_frame(conn, sql, params), watermark
+
+
+def merge_changes(frame: pd.DataFrame, changes: pd.DataFrame, key: str = "id") -> pd.DataFrame:
+    """Replace rows of ``frame`` by ``key`` with ``changes`` (upsert) and restore the query order."""
+    if changes.empty:
+        return frame
+    if frame.empty:
+        return changes
+    kept = frame[~frame[key].isin(changes[key])]
+    out = compact_frame(pd.concat([kept, changes], ignore_index=True))
+    return out.sort_values(["production_date", "line", "style_number"], kind="stable").reset_index(drop=True)
+
+
+class IncrementalDayFrame:
+    """All rows of one production_date, kept current by watermark-based delta fetches.
+
+    The first refresh loads the whole day; later refreshes pull only rows
+    written since the last watermark and upsert them by ``id``. Because
+    deletes are invisible to the delta query, a full reload is forced every
+    ``full_reload_s`` seconds (and after xid wraparound or if the table has no id).
+    """
+
+    def __init__(self, day: str, full_reload_s: float = 900.0):
+        self.day = day
+        self.full_reload_s = full_reload_s
+        self._lock = threading.Lock()
+        self._frame: Optional[pd.DataFrame] = None
+        self._index: Optional[FrameIndex] = None
+        self._watermark: Optional[int] = None
+        self._loaded_at = 0.0
+        self._refreshed_at = 0.0
 
-    where_clause = " AND ".join(filters)
+    def refresh(self, max_age: Optional[float] = None) -> int:
+        """Fetch changes since the last refresh; returns the number of rows fetched.
+
+        With ``max_age``, a refresh finished within that many seconds is reused,
+        so callers queued on the lock share the first caller's fetch.
+        """
+        with self._lock:
+            if max_age is not None and self._frame is not None and time.monotonic() - self._refreshed_at <= max_age:
+                return 0
+            full = (
+                self._frame is None
+                or "id" not in self._frame
+                or time.monotonic() - self._loaded_at >= self.full_reload_s
+            )
+            changes, watermark = fetch_changes(self.day, None if full else self._watermark)
+            if full or (self._watermark is not None and watermark < self._watermark):
+                if not full:
+                    changes, watermark = fetch_changes(self.day, None)
+                self._frame = changes
+                self._loaded_at = time.monotonic()
+            else:
+                self._frame = merge_changes(self._frame, changes)
+            if full or len(changes):
+                self._index = None
+            self._watermark = watermark
+            self._refreshed_at = time.monotonic()
+            return len(changes)
+
+    def frame(self, max_age: Optional[float] = None) -> pd.DataFrame:
+        """Current rows; fetches changes first when never loaded or older than ``max_age`` seconds."""
+        if self._frame is None or (max_age is not None and time.monotonic() - self._refreshed_at > max_age):
+            self.refresh(max_age)
+        return self._frame
+
+    def index(self, max_age: Optional[float] = None) -> FrameIndex:
+        """FrameIndex over the current rows, rebuilt only after a refresh changed them."""
+        frame = self.frame(max_age)
+        with self._lock:
+            if self._index is None or self._index.frame is not self._frame:
+                self._index = FrameIndex(self._frame)
+            return self._index
+
+
+_day_frames: dict[str, IncrementalDayFrame] = {}
+_day_frames_lock = threading.Lock()
+
+
+def get_day_frame(day: str) -> IncrementalDayFrame:
+    """Process-wide incremental frame for ``day``; frames for other days are dropped."""
+    with _day_frames_lock:
+        if day not in _day_frames:
+            _day_frames.clear()
+            _day_frames[day] = IncrementalDayFrame(day)
+        return _day_frames[day]
+
+
+def copy_production_csv(out: IO[bytes], date_from: str, date_to: Optional[str] = None,
+                        line: Optional[list[str]] = None, category: Optional[list[str]] = None,
+                        style_like: Optional[str] = None, styles: Optional[list[str]] = None,
+                        chunk_size: int = 1 << 16) -> None:
+    """Stream filtered rows as CSV (with header) into a binary file via COPY ... TO STDOUT.
+
+    PostgreSQL renders the CSV and psycopg2's copy_expert writes it to ``out`` in
+    ``chunk_size`` pieces, so no rows are materialized in Python.
+    """
+    where_clause, params = _build_filters(date_from, date_to, line, category, style_like, styles)
+    sql = text(
+        f"COPY (SELECT * FROM {_table_ident()} WHERE {where_clause} "
+        f"ORDER BY production_date, line, style_number) TO STDOUT WITH CSV HEADER"
+    )
+    with _connect() as conn:
+        _lift_statement_timeout(conn)
+        compiled = sql.compile(dialect=conn.dialect)
+        with conn.connection.dbapi_connection.cursor() as cur:
+            # COPY takes no bind parameters; mogrify inlines them with psycopg2 quoting
+            copy_sql = cur.mogrify(str(compiled), compiled.construct_params(params)).decode()
+            cur.copy_expert(copy_sql, out, size=chunk_size)
+
+
+def _arrow_types() -> dict:
+    import pyarrow as pa
+
+    types = {c: pa.int32() for c in _INT_COLUMNS}
+    types.update({c: pa.dictionary(pa.int32(), pa.string()) for c in _CATEGORY_COLUMNS})
+    types.update({"id": pa.int64(), "production_date": pa.date32(), "average_hourly": pa.float64()})
+    return types
+
+
+def fetch_production_arrow(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
+                           category: Optional[list[str]] = None, style_like: Optional[str] = None,
+                           styles: Optional[list[str]] = None):
+    """Filtered rows as a ``pyarrow.Table`` built without Python objects per value.
+
+    PostgreSQL streams the rows as CSV via COPY (see copy_production_csv) into
+    an Arrow buffer, and pyarrow's multithreaded CSV reader builds the typed
+    columns directly: int32 quantities, date32 production_date and
+    dictionary-encoded line/category/style_number. Requires pyarrow (a
+    Streamlit dependency).
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    sink = pa.BufferOutputStream()
+    copy_production_csv(sink, date_from, date_to, line, category, style_like, styles)
+    return pacsv.read_csv(
+        pa.BufferReader(sink.getvalue()),
+        convert_options=pacsv.ConvertOptions(column_types=_arrow_types(), strings_can_be_null=True),
+    )
+
+
+def filter_arrow(table, lines: tuple[str, ...] = (), cats: tuple[str, ...] = (),
+                 styles: tuple[str, ...] = (), style_like: str = ""):
+    """Apply the _build_filters semantics to an Arrow table with pyarrow.compute.
+
+    Substring search runs on each chunk's dictionary (distinct values) and is
+    mapped back to rows through the indices.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    masks = []
+    for col, values in (("line", lines), ("category", cats), ("style_number", styles)):
+        if values:
+            masks.append(pc.is_in(table[col], value_set=pa.array(list(values), pa.string())))
+    if not styles and style_like:
+        chunks = []
+        for chunk in table["style_number"].chunks:
+            if pa.types.is_dictionary(chunk.type):
+                hit = pc.match_substring(chunk.dictionary, style_like, ignore_case=True)
+                chunks.append(pc.take(hit, chunk.indices))
+            else:
+                chunks.append(pc.match_substring(chunk, style_like, ignore_case=True))
+        masks.append(pc.fill_null(pa.chunked_array(chunks, pa.bool_()), False))
+    if not masks:
+        return table
+    mask = masks[0]
+    for m in masks[1:]:
+        mask = pc.and_(mask, m)
+    return table.filter(mask)
+
+
+def frame_from_arrow(table) -> pd.DataFrame:
+    """Convert an Arrow production table to a pandas frame with the compact_frame() dtypes."""
+    import pyarrow as pa
+
+    nullable = {pa.int16(): pd.Int16Dtype(), pa.int32(): pd.Int32Dtype()}
+    df = table.to_pandas(types_mapper=nullable.get, date_as_object=False)
+    if "production_date" in df:
+        df["production_date"] = df["production_date"].astype("datetime64[s]")
+    return compact_frame(df)
+
+
+def daily_kpis_arrow(table) -> list[dict]:
+    """Per-day KPI components of an Arrow production table, like fetch_daily_kpis() (days with rows only)."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if table.num_rows == 0:
+        return []
+    agg = table.group_by("production_date").aggregate([
+        ([], "count_all"),
+        ("daily_production_total", "sum"),
+        ("average_hourly", "sum"),
+        ("average_hourly", "count"),
+    ]).sort_by("production_date")
+    return pa.table({
+        "production_date": agg["production_date"],
+        "row_count": agg["count_all"].cast(pa.int64()),
+        "total_output": pc.fill_null(agg["daily_production_total_sum"], 0).cast(pa.int64()),
+        "avg_hourly_sum": pc.fill_null(agg["average_hourly_sum"].cast(pa.float64()), 0.0),
+        "avg_hourly_n": agg["average_hourly_count"].cast(pa.int64()),
+    }).to_pylist()
+
+
+def hourly_totals_arrow(table) -> list[dict]:
+    """Per-day time-slot sums of an Arrow production table, like fetch_hourly_totals()."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if table.num_rows == 0:
+        return []
+    agg = table.group_by("production_date").aggregate([(c, "sum") for c in HOUR_COLUMNS]).sort_by("production_date")
+    columns = {"production_date": agg["production_date"]}
+    for c in HOUR_COLUMNS:
+        columns[c] = pc.fill_null(agg[f"{c}_sum"], 0).cast(pa.int64())
+    return pa.table(columns).to_pylist()
+
+
+def fetch_filter_options(date_from: str, date_to: Optional[str] = None) -> dict[str, list[str]]:
+    """Distinct line/category/style values within the date range, for sidebar option lists.
+
+    Returns {"line": [...], "category": [...], "style_number": [...]} sorted ascending.
+    """
+    where_clause, params = _build_filters(date_from, date_to)
     table = _table_ident()
+    options: dict[str, list[str]] = {}
+    with _connect() as conn:
+        for col in ("line", "category", "style_number"):
+            sql = text(
+                f"SELECT DISTINCT {col} FROM {table} WHERE {where_clause} AND {col} IS NOT NULL ORDER BY {col}"
+            )
+            options[col] = [r[0] for r in conn.execute(sql, params)]
+    return options
+
+
+def _hour_sums(rolled: bool = False) -> str:
+    """COALESCE(SUM(col), 0) for each hourly column; ``rolled`` sums pre-aggregated bigint columns."""
+    cast = "::bigint" if rolled else ""
+    return ", ".join(f"COALESCE(SUM({c}), 0){cast} AS {c}" for c in HOUR_COLUMNS)
+
+
+# Rollup tables: per date x line x category and per date x style, each holding the
+# KPI components and hourly sums for its key. Days land in the dirty table on any
+# write to production_data and are rebuilt by refresh_rollups(): periodically by the
+# live listener, or by `python -m app.schema rollups --dirty` from cron when live
+# updates are off.
+_ROLLUP_KEYS = {"line": ("line", "category"), "style": ("style_number",)}
+_MEASURE_COLUMNS = ("row_count", "total_output", "avg_hourly_sum", "avg_hourly_n", *HOUR_COLUMNS)
+
+
+def _rollup_ident(name: str) -> str:
+    return f"{_get_schema()}.production_rollup_{name}"
+
+
+def _raw_measures() -> str:
+    return (
+        "COUNT(*) AS row_count, COALESCE(SUM(daily_production_total), 0) AS total_output, "
+        "COALESCE(SUM(average_hourly), 0) AS avg_hourly_sum, COUNT(average_hourly) AS avg_hourly_n, "
+        + _hour_sums()
+    )
+
+
+def ensure_rollups() -> None:
+    """Create the rollup tables and the statement triggers that mark changed days dirty."""
+    schema = _get_schema()
+    table = _table_ident()
+    hour_defs = ", ".join(f"{c} bigint NOT NULL" for c in HOUR_COLUMNS)
+    measure_defs = (
+        "row_count bigint NOT NULL, total_output bigint NOT NULL, "
+        f"avg_hourly_sum numeric NOT NULL, avg_hourly_n bigint NOT NULL, {hour_defs}"
+    )
+    ddl = f"""
+    CREATE TABLE IF NOT EXISTS {_rollup_ident("line")} (
+        production_date date NOT NULL, line text, category text, {measure_defs});
+    CREATE INDEX IF NOT EXISTS production_rollup_line_date ON {_rollup_ident("line")} (production_date);
+    CREATE TABLE IF NOT EXISTS {_rollup_ident("style")} (
+        production_date date NOT NULL, style_number text, {measure_defs});
+    CREATE INDEX IF NOT EXISTS production_rollup_style_date ON {_rollup_ident("style")} (production_date);
+    CREATE TABLE IF NOT EXISTS {_rollup_ident("state")} (
+        production_date date PRIMARY KEY, refreshed_at timestamptz NOT NULL DEFAULT now());
+    CREATE TABLE IF NOT EXISTS {_rollup_ident("dirty")} (production_date date PRIMARY KEY);
+
+    CREATE OR REPLACE FUNCTION {schema}.production_rollup_mark_dirty() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO {_rollup_ident("dirty")}
+            SELECT DISTINCT production_date FROM new_rows ON CONFLICT DO NOTHING;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            INSERT INTO {_rollup_ident("dirty")}
+            SELECT DISTINCT production_date FROM old_rows ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END
+    $$;
+    DROP TRIGGER IF EXISTS production_rollup_dirty_ins ON {table};
+    DROP TRIGGER IF EXISTS production_rollup_dirty_upd ON {table};
+    DROP TRIGGER IF EXISTS production_rollup_dirty_del ON {table};
+    CREATE TRIGGER production_rollup_dirty_ins AFTER INSERT ON {table}
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {schema}.production_rollup_mark_dirty();
+    CREATE TRIGGER production_rollup_dirty_upd AFTER UPDATE ON {table}
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {schema}.production_rollup_mark_dirty();
+    CREATE TRIGGER production_rollup_dirty_del AFTER DELETE ON {table}
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {schema}.production_rollup_mark_dirty();
+    """
+    with get_engine().begin() as conn:
+        conn.exec_driver_sql(ddl)
+    _rollup_status.clear()
+
+
+def refresh_rollups(days: Optional[list[str]] = None, before: Optional[str] = None) -> list[str]:
+    """Rebuild rollup rows for ``days``, or for the dirty days before ``before`` (default today).
+
+    Each day is deleted and re-aggregated from production_data in one transaction,
+    so the cost is proportional to the affected dates. Today is left dirty by
+    default because it keeps changing during the shift; readers aggregate
+    dirty days from the raw table. Pass explicit ``days`` to backfill history.
+    Returns the refreshed days as ISO strings (none when ensure_rollups() was never run).
+    """
+    if not _rollups_available(get_engine()):
+        return []
+    table = _table_ident()
+    with _connect() as conn:
+        _lift_statement_timeout(conn)
+        if days is None:
+            res = conn.execute(
+                text(f"DELETE FROM {_rollup_ident('dirty')} WHERE production_date < :before RETURNING production_date"),
+                {"before": before or dt.date.today().isoformat()},
+            )
+            days = sorted(str(r[0]) for r in res)
+        else:
+            days = sorted(set(days))
+            conn.execute(text(f"DELETE FROM {_rollup_ident('dirty')} WHERE production_date = ANY(CAST(:days AS date[]))"),
+                         {"days": days})
+        if days:
+            params = {"days": days}
+            for kind, keys in _ROLLUP_KEYS.items():
+                cols = ", ".join(keys)
+                rollup = _rollup_ident(kind)
+                conn.execute(text(f"DELETE FROM {rollup} WHERE production_date = ANY(CAST(:days AS date[]))"), params)
+                conn.execute(text(
+                    f"INSERT INTO {rollup} (production_date, {cols}, {', '.join(_MEASURE_COLUMNS)}) "
+                    f"SELECT production_date, {cols}, {_raw_measures()} FROM {table} "
+                    f"WHERE production_date = ANY(CAST(:days AS date[])) GROUP BY production_date, {cols}"
+                ), params)
+            conn.execute(text(
+                f"INSERT INTO {_rollup_ident('state')} (production_date, refreshed_at) "
+                "SELECT d, now() FROM unnest(CAST(:days AS date[])) AS d "
+                "ON CONFLICT (production_date) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at"
+            ), params)
+        conn.commit()
+    return days
+
+
+def _rollups_available(eng: Engine) -> bool:
+    schema = _get_schema()
+    if (eng, schema) not in _rollup_status:
+        sql = text(
+            """
+            SELECT COUNT(*) FROM information_schema.tables
+            WHERE table_schema = :schema AND table_name IN (
+                'production_rollup_line', 'production_rollup_style',
+                'production_rollup_state', 'production_rollup_dirty')
+            """
+        )
+        with eng.connect() as conn:
+            _rollup_status[(eng, schema)] = conn.execute(sql, {"schema": schema}).scalar() == 4
+    return _rollup_status[(eng, schema)]
+
+
+def _pick_rollup(line, category, style_like, styles, by_style: bool = False) -> Optional[str]:
+    """Rollup kind that can answer the filter set, or None to aggregate raw rows only.
+
+    The line rollup cannot filter by style; the style rollup cannot filter by line/category.
+    """
+    if not _rollups_available(get_engine()):
+        return None
+    if by_style or styles or style_like:
+        return None if (line or category) else "style"
+    return "line"
+
+
+def _measure_source(where_clause: str, kind: Optional[str]) -> str:
+    """Subquery of per-day measures: rollup rows for fresh days, raw aggregation for the rest."""
+    keys = ", ".join(("production_date", *_ROLLUP_KEYS.get(kind or "", ())))
+    raw = f"SELECT {keys}, {_raw_measures()} FROM {_table_ident()} WHERE {where_clause}"
+    if kind is None:
+        return f"{raw} GROUP BY {keys}"
+    fresh = (
+        f"SELECT s.production_date FROM {_rollup_ident('state')} s "
+        "WHERE s.production_date BETWEEN :dfrom AND :dto AND NOT EXISTS ("
+        f"SELECT 1 FROM {_rollup_ident('dirty')} d WHERE d.production_date = s.production_date)"
+    )
+    return (
+        f"SELECT {keys}, {', '.join(_MEASURE_COLUMNS)} FROM {_rollup_ident(kind)} "
+        f"WHERE {where_clause} AND production_date IN ({fresh}) "
+        f"UNION ALL {raw} AND production_date NOT IN ({fresh}) GROUP BY {keys}"
+    )
+
+
+def fetch_kpis(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
+               category: Optional[list[str]] = None, style_like: Optional[str] = None,
+               styles: Optional[list[str]] = None) -> dict:
+    """Headline KPIs aggregated in PostgreSQL (from rollups when the filters allow).
+
+    Returns {"row_count": int, "total_output": int, "avg_hourly": float}.
+    """
+    sql, params = kpis_query(date_from, date_to, line, category, style_like, styles)
+    return _kpis_result(_execute(sql, params)[0])
+
+
+def _kpis_result(row) -> dict:
+    return {
+        "row_count": int(row["row_count"]),
+        "total_output": int(row["total_output"]),
+        "avg_hourly": float(row["avg_hourly"]),
+    }
+
+
+def kpis_query(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
+               category: Optional[list[str]] = None, style_like: Optional[str] = None,
+               styles: Optional[list[str]] = None):
+    """SQL and params for fetch_kpis."""
+    where_clause, params = _build_filters(date_from, date_to, line, category, style_like, styles)
+    src = _measure_source(where_clause, _pick_rollup(line, category, style_like, styles))
+    sql = text(
+        f"""
+        SELECT COALESCE(SUM(row_count), 0) AS row_count,
+               COALESCE(SUM(total_output), 0) AS total_output,
+               COALESCE(SUM(avg_hourly_sum) / NULLIF(SUM(avg_hourly_n), 0), 0) AS avg_hourly
+        FROM ({src}) AS src
+        """
+    )
+    return sql, params
+
+
+def fetch_daily_kpis(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
+                     category: Optional[list[str]] = None, style_like: Optional[str] = None,
+                     styles: Optional[list[str]] = None):
+    """Per-date KPI components, combinable across any set of days.
+
+    One row per production_date with row_count, total_output, and the sum/count
+    of non-null average_hourly so the range average can be recomputed exactly.
+    """
+    sql, params = daily_kpis_query(date_from, date_to, line, category, style_like, styles)
+    return _execute(sql, params)
+
+
+def daily_kpis_query(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
+                     category: Optional[list[str]] = None, style_like: Optional[str] = None,
+                     styles: Optional[list[str]] = None):
+    """SQL and params for fetch_daily_kpis."""
+    where_clause, params = _build_filters(date_from, date_to, line, category, style_like, styles)
+    src = _measure_source(where_clause, _pick_rollup(line, category, style_like, styles))
     sql = text(
-        f"SELECT * FROM {table} WHERE {where_clause} ORDER BY production_date, line, style_number"
+        f"""
+        SELECT production_date,
+               SUM(row_count)::bigint AS row_count,
+               SUM(total_output)::bigint AS total_output,
+               SUM(avg_hourly_sum) AS avg_hourly_sum,
+               SUM(avg_hourly_n)::bigint AS avg_hourly_n
+        FROM ({src}) AS src
+        GROUP BY production_date
+        ORDER BY production_date
+        """
     )
-    eng = get_engine()
-    if not _table_exists(eng):
-        raise RuntimeError(
-            f"Table not found: {table}. Import Cloud_SQL_sample_DB.sql or set postgres.schema correctly in secrets."
+    return sql, params
+
+
+def fetch_top_styles(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
+                     category: Optional[list[str]] = None, style_like: Optional[str] = None,
+                     styles: Optional[list[str]] = None, limit: int = 10):
+    """Top styles by summed daily_production_total, largest first."""
+    sql, params = top_styles_query(date_from, date_to, line, category, style_like, styles, limit)
+    return _execute(sql, params)
+
+
+def top_styles_query(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
+                     category: Optional[list[str]] = None, style_like: Optional[str] = None,
+                     styles: Optional[list[str]] = None, limit: int = 10):
+    """SQL and params for fetch_top_styles."""
+    where_clause, params = _build_filters(date_from, date_to, line, category, style_like, styles)
+    params["limit"] = int(limit)
+    kind = _pick_rollup(line, category, style_like, styles, by_style=True)
+    if kind is None:
+        sql = text(
+            f"""
+            SELECT style_number, COALESCE(SUM(daily_production_total), 0) AS daily_production_total
+            FROM {_table_ident()}
+            WHERE {where_clause} AND style_number IS NOT NULL
+            GROUP BY style_number
+            ORDER BY daily_production_total DESC, style_number
+            LIMIT :limit
+            """
+        )
+    else:
+        sql = text(
+            f"""
+            SELECT style_number, SUM(total_output)::bigint AS daily_production_total
+            FROM ({_measure_source(where_clause, kind)}) AS src
+            WHERE style_number IS NOT NULL
+            GROUP BY style_number
+            ORDER BY daily_production_total DESC, style_number
+            LIMIT :limit
+            """
         )
-    with eng.connect() as conn:
-        res = conn.execute(sql, params)
-        rows = res.mappings().all()
-    return rows
+    return sql, params
+
+
+def fetch_hourly_totals(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
+                        category: Optional[list[str]] = None, style_like: Optional[str] = None,
+                        styles: Optional[list[str]] = None):
+    """Per-date sums of each hourly column (one row per production_date, wide)."""
+    sql, params = hourly_totals_query(date_from, date_to, line, category, style_like, styles)
+    return _execute(sql, params)
+
+
+def hourly_totals_query(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
+                        category: Optional[list[str]] = None, style_like: Optional[str] = None,
+                        styles: Optional[list[str]] = None):
+    """SQL and params for fetch_hourly_totals."""
+    where_clause, params = _build_filters(date_from, date_to, line, category, style_like, styles)
+    kind = _pick_rollup(line, category, style_like, styles)
+    if kind is None:
+        source = f"{_table_ident()} WHERE {where_clause}"
+    else:
+        source = f"({_measure_source(where_clause, kind)}) AS src"
+    sql = text(
+        f"""
+        SELECT production_date, {_hour_sums(rolled=kind is not None)}
+        FROM {source}
+        GROUP BY production_date
+        ORDER BY production_date
+        """
+    )
+    return sql, params
+
+
+def fetch_style_hour_grid(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
+                          category: Optional[list[str]] = None, style_like: Optional[str] = None,
+                          styles: Optional[list[str]] = None):
+    """Per-style sums of each hourly column (one row per style_number, wide)."""
+    sql, params = style_hour_grid_query(date_from, date_to, line, category, style_like, styles)
+    return _execute(sql, params)
+
+
+def style_hour_grid_query(date_from: str, date_to: Optional[str] = None, line: Optional[list[str]] = None,
+                          category: Optional[list[str]] = None, style_like: Optional[str] = None,
+                          styles: Optional[list[str]] = None):
+    """SQL and params for fetch_style_hour_grid."""
+    where_clause, params = _build_filters(date_from, date_to, line, category, style_like, styles)
+    kind = _pick_rollup(line, category, style_like, styles, by_style=True)
+    if kind is None:
+        source = f"{_table_ident()} WHERE {where_clause} AND style_number IS NOT NULL"
+    else:
+        source = f"({_measure_source(where_clause, kind)}) AS src WHERE style_number IS NOT NULL"
+    sql = text(
+        f"""
+        SELECT style_number, {_hour_sums(rolled=kind is not None)}
+        FROM {source}
+        GROUP BY style_number
+        ORDER BY style_number
+        """
+    )
+    return sql, params
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import threading
+from functools import lru_cache
+from typing import Any, Awaitable, Coroutine, Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+# Support running as package (app.*) or script (local modules)
+try:
+    from app import db  # type: ignore
+except ModuleNotFoundError:
+    import db  # type: ignore
+
+
+# Bind params asyncpg types as date (it does not coerce ISO strings like psycopg2)
+_DATE_PARAMS = ("dfrom", "dto", "day", "before")
+
+
+@lru_cache(maxsize=1)
+def get_async_engine() -> AsyncEngine:
+    """asyncpg engine with the same connection settings and pool options as get_engine().
+
+    The async layer is optional: it needs asyncpg and greenlet (requirements-async.txt).
+    """
+    try:
+        import asyncpg  # type: ignore  # noqa: F401
+        import greenlet  # type: ignore  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            "db_async requires asyncpg and sqlalchemy[asyncio] (pip install -r requirements-async.txt)."
+        ) from e
+    url = db._build_conn_str().replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+    return create_async_engine(
+        url,
+        **db._pool_options(),
+        connect_args={"server_settings": db._session_settings()},
+    )
+
+
+def _async_params(params: dict) -> dict:
+    return {
+        k: dt.date.fromisoformat(v) if k in _DATE_PARAMS and isinstance(v, str) else v
+        for k, v in params.items()
+    }
+
+
+async def _execute(sql, params: dict):
+    """Async counterpart of db._execute with the same RuntimeError translation."""
+    table = db._table_ident()
+    try:
+        async with get_async_engine().connect() as conn:
+            res = await conn.execute(sql, _async_params(params))
+            return res.mappings().all()
+    except Exception as e:
+        error = db._translate_error(e, table)
+        if error is None:
+            raise
+        raise error from e
+
+
+async def _run_query(builder, *args, **kwargs):
+    # Builders may probe rollup availability synchronously (memoized); keep that off the event loop
+    sql, params = await asyncio.to_thread(builder, *args, **kwargs)
+    return await _execute(sql, params)
+
+
+async def fetch_production(date_from: str, date_to: Optional[str] = None, **filters):
+    return await _run_query(db.production_query, date_from, date_to, **filters)
+
+
+async def fetch_kpis(date_from: str, date_to: Optional[str] = None, **filters) -> dict:
+    rows = await _run_query(db.kpis_query, date_from, date_to, **filters)
+    return db._kpis_result(rows[0])
+
+
+async def fetch_daily_kpis(date_from: str, date_to: Optional[str] = None, **filters):
+    return await _run_query(db.daily_kpis_query, date_from, date_to, **filters)
+
+
+async def fetch_top_styles(date_from: str, date_to: Optional[str] = None, limit: int = 10, **filters):
+    return await _run_query(db.top_styles_query, date_from, date_to, limit=limit, **filters)
+
+
+async def fetch_hourly_totals(date_from: str, date_to: Optional[str] = None, **filters):
+    return await _run_query(db.hourly_totals_query, date_from, date_to, **filters)
+
+
+async def fetch_style_hour_grid(date_from: str, date_to: Optional[str] = None, **filters):
+    return await _run_query(db.style_hour_grid_query, date_from, date_to, **filters)
+
+
+async def fetch_dashboard(date_from: str, date_to: Optional[str] = None, **filters) -> dict[str, Any]:
+    """Run the KPI and per-tab queries concurrently; latency is the slowest query, not the sum.
+
+    ``filters`` are the fetch_production keyword filters (line, category, style_like, styles).
+    Returns {"kpis", "top_styles", "hourly_totals", "style_hour_grid"}.
+    """
+    kpis, top, hourly, grid = await asyncio.gather(
+        fetch_kpis(date_from, date_to, **filters),
+        fetch_top_styles(date_from, date_to, **filters),
+        fetch_hourly_totals(date_from, date_to, **filters),
+        fetch_style_hour_grid(date_from, date_to, **filters),
+    )
+    return {"kpis": kpis, "top_styles": top, "hourly_totals": hourly, "style_hour_grid": grid}
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    # The async engine's pooled connections belong to one event loop, so all
+    # sync callers share a single long-lived loop thread.
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="db-async-loop", daemon=True).start()
+        return _loop
+
+
+def run(coro: Coroutine | Awaitable, timeout: Optional[float] = None):
+    """Run a coroutine of this module from synchronous code (e.g. a Streamlit script) and wait for it."""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result(timeout)
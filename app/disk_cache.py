@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import datetime as dt
+import functools
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Support running as package (app.*) or script (local modules)
+try:
+    from app import db  # type: ignore
+    from app.cache import _days, _runs  # type: ignore
+    from app.settings import setting  # type: ignore
+except ModuleNotFoundError:
+    import db  # type: ignore
+    from cache import _days, _runs  # type: ignore
+    from settings import setting  # type: ignore
+
+MANIFEST = "manifest.json"
+
+# File formats: zstd Parquet (compact, decoded on read) or uncompressed Arrow IPC (memory-mapped zero-copy)
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+class DiskDayCache:
+    """Unfiltered production rows of closed days as one file per day.
+
+    Files live under ``root/<schema>/`` next to a JSON manifest
+    ({day: {"file", "bytes", "rows", "written", "used"}}) that drives the
+    size cap: when the total exceeds ``max_bytes`` the least recently used
+    days are deleted. Files and the manifest are written to a temp name and
+    renamed into place, so a crash or a second process never sees a partial
+    file, and readers that still map a replaced file keep the old contents.
+    Only days at least ``min_age_days`` old are stored or served, so late
+    corrections to recent days still come from the database; changes to
+    older days must be dropped with invalidate_days() (the live listener
+    does this).
+
+    With ``fmt="arrow"`` the tables are read through a read-only memory map
+    without copying, so several server processes on one host share a single
+    copy of each day in the OS page cache (put ``root`` on a tmpfs such as
+    /dev/shm to keep it in RAM). A process picks up days written by
+    another one from the directory instead of fetching them again.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 1 << 30, fmt: str = "parquet", min_age_days: int = 2):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown disk cache format {fmt!r}; expected one of {sorted(FORMATS)}")
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fmt = fmt
+        self.min_age_days = max(1, min_age_days)
+        self._lock = threading.RLock()
+        self._manifests: dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _dir(self) -> str:
+        path = os.path.join(self.root, db._get_schema())
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _manifest(self) -> dict:
+        path = self._dir()
+        if path not in self._manifests:
+            try:
+                with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+                    days = json.load(f).get("days", {})
+            except (OSError, ValueError):
+                days = {}
+            # Drop entries whose file vanished (evicted by another process, manual cleanup)
+            self._manifests[path] = {
+                day: e for day, e in days.items() if os.path.exists(os.path.join(path, e["file"]))
+            }
+        return self._manifests[path]
+
+    def _save_manifest(self) -> None:
+        path = self._dir()
+        manifest = self._manifest()
+        # Merge days recorded by other processes sharing the directory
+        try:
+            with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+                on_disk = json.load(f).get("days", {})
+        except (OSError, ValueError):
+            on_disk = {}
+        for day, entry in on_disk.items():
+            if day not in manifest and os.path.exists(os.path.join(path, entry["file"])):
+                manifest[day] = entry
+        tmp = os.path.join(path, f".{MANIFEST}.{os.getpid()}.{threading.get_ident()}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "days": manifest}, f)
+        os.replace(tmp, os.path.join(path, MANIFEST))
+
+    def _read(self, file: str) -> pa.Table:
+        # By extension, so files written before a disk_format change stay readable
+        if file.endswith(FORMATS["arrow"]):
+            return pa.ipc.open_file(pa.memory_map(file, "r")).read_all()
+        return pq.read_table(file, memory_map=True)
+
+    def _write(self, table: pa.Table, file: str) -> None:
+        if self.fmt == "arrow":
+            # The IPC file format allows one dictionary per column; multi-chunk
+            # tables from the CSV reader carry one per chunk
+            table = table.unify_dictionaries().combine_chunks()
+            with pa.OSFile(file, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        else:
+            pq.write_table(table, file, compression="zstd")
+
+    def final(self, day: str) -> bool:
+        """Whether ``day`` is old enough to be kept on disk."""
+        return day <= (dt.date.today() - dt.timedelta(days=self.min_age_days)).isoformat()
+
+    def get(self, day: str) -> Optional[pa.Table]:
+        """Rows of ``day`` (memory-mapped read) or None when not cached or not final yet."""
+        if not self.final(day):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            entry = self._manifest().get(day)
+            if entry is None:
+                name = day + FORMATS[self.fmt]
+                file = os.path.join(self._dir(), name)
+                if not os.path.exists(file):
+                    self.misses += 1
+                    return None
+                # Written by another process since our manifest was loaded
+                entry = self._manifest()[day] = {
+                    "file": name, "bytes": os.path.getsize(file), "rows": None,
+                    "written": os.path.getmtime(file), "used": time.time(),
+                }
+            entry["used"] = time.time()
+            file = os.path.join(self._dir(), entry["file"])
+        try:
+            table = self._read(file)
+        except (OSError, pa.ArrowInvalid):
+            with self._lock:
+                self._manifest().pop(day, None)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return table
+
+    def put(self, day: str, table: pa.Table) -> None:
+        if not self.final(day):
+            return
+        path = self._dir()
+        name = day + FORMATS[self.fmt]
+        tmp = os.path.join(path, f".{name}.{os.getpid()}.{threading.get_ident()}")
+        try:
+            self._write(table, tmp)
+            os.replace(tmp, os.path.join(path, name))
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        now = time.time()
+        with self._lock:
+            old = self._manifest().get(day)
+            if old is not None and old["file"] != name:
+                # Same day stored in the previous disk_format
+                try:
+                    os.remove(os.path.join(path, old["file"]))
+                except OSError:
+                    pass
+            self._manifest()[day] = {
+                "file": name, "bytes": os.path.getsize(os.path.join(path, name)),
+                "rows": table.num_rows, "written": now, "used": now,
+            }
+            self._evict()
+            self._save_manifest()
+
+    def _evict(self) -> None:
+        manifest = self._manifest()
+        total = sum(e["bytes"] for e in manifest.values())
+        for day in sorted(manifest, key=lambda d: manifest[d]["used"]):
+            if total <= self.max_bytes:
+                break
+            entry = manifest.pop(day)
+            total -= entry["bytes"]
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self._dir(), entry["file"]))
+            except OSError:
+                pass
+
+    def invalidate_days(self, days: set[str]) -> int:
+        """Delete the files of ``days`` (also ones written by other processes); returns the count removed."""
+        with self._lock:
+            manifest = self._manifest()
+            dropped = 0
+            for day in days:
+                entry = manifest.pop(day, None)
+                name = entry["file"] if entry else day + FORMATS[self.fmt]
+                try:
+                    os.remove(os.path.join(self._dir(), name))
+                    dropped += 1
+                except OSError:
+                    pass
+            if dropped:
+                self._save_manifest()
+            return dropped
+
+    def load_range(self, date_from: str, date_to: str) -> pa.Table:
+        """Rows of all days in the (closed) range; days not on disk are fetched in runs and stored if final."""
+        days = _days(date_from, date_to)
+        tables = {day: self.get(day) for day in days}
+        for first, last in _runs([d for d in days if tables[d] is None]):
+            fetched = db.fetch_production_arrow(first, last)
+            dates = fetched["production_date"]
+            for day in _days(first, last):
+                part = fetched.filter(pc.equal(dates, pa.scalar(dt.date.fromisoformat(day), pa.date32())))
+                self.put(day, part)
+                tables[day] = part
+        parts = [tables[d] for d in days]
+        return pa.concat_tables(parts, promote_options="permissive") if len(parts) > 1 else parts[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            manifest = self._manifest()
+            return {
+                "format": self.fmt,
+                "days": len(manifest),
+                "bytes": sum(e["bytes"] for e in manifest.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+@functools.lru_cache(maxsize=1)
+def get_disk_cache() -> Optional[DiskDayCache]:
+    """Disk cache configured from the `cache` block, or None when no directory is set.
+
+    Keys: disk_dir (CACHE_DISK_DIR), disk_max_mb (CACHE_DISK_MAX_MB),
+    disk_format (CACHE_DISK_FORMAT: "parquet" or "arrow" for memory-mapped
+    Arrow IPC shared across server processes), disk_min_age_days
+    (CACHE_DISK_MIN_AGE_DAYS, default 2: yesterday is still read from the
+    database).
+    """
+    root = setting("cache", "disk_dir", "CACHE_DISK_DIR", "").strip()
+    if not root:
+        return None
+    max_mb = float(setting("cache", "disk_max_mb", "CACHE_DISK_MAX_MB", "1024"))
+    fmt = setting("cache", "disk_format", "CACHE_DISK_FORMAT", "parquet").strip().lower()
+    min_age = int(setting("cache", "disk_min_age_days", "CACHE_DISK_MIN_AGE_DAYS", "2"))
+    return DiskDayCache(os.path.expanduser(root), max_bytes=int(max_mb * (1 << 20)), fmt=fmt, min_age_days=min_age)
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+# Dimensions with per-value bitmaps, in the order filters are applied
+DIMENSIONS = ("line", "category", "style_number")
+
+_NGRAM = 3
+
+
+def _ngrams(text: str) -> set[str]:
+    return {text[i:i + _NGRAM] for i in range(len(text) - _NGRAM + 1)}
+
+
+class FrameIndex:
+    """Prebuilt lookup structures over one (read-only) production frame.
+
+    For each dimension it keeps the sorted option list and a packed row
+    bitmap per value, so a filter is a few bitwise OR/AND operations over
+    ``len(frame) / 8`` bytes instead of ``isin``/``str.contains`` scans.
+    Style search goes through a lowercased trigram index of the distinct
+    style numbers; only candidate styles are substring-checked.
+
+    Build it once per frame version (see IncrementalDayFrame.index()).
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        self.rows = len(frame)
+        self._values: dict[str, list[str]] = {}
+        self._bitmaps: dict[str, dict[str, np.ndarray]] = {}
+        for col in DIMENSIONS:
+            if col in frame:
+                self._index_column(col, frame[col])
+        styles = self._values.get("style_number", [])
+        self._styles_lower = [s.lower() for s in styles]
+        self._style_ngrams: dict[str, set[int]] = {}
+        for i, s in enumerate(self._styles_lower):
+            for gram in _ngrams(s):
+                self._style_ngrams.setdefault(gram, set()).add(i)
+
+    def _index_column(self, col: str, values: pd.Series) -> None:
+        cat = values.array if isinstance(values.dtype, pd.CategoricalDtype) else pd.Categorical(values)
+        codes = np.asarray(cat.codes)
+        labels = [str(v) for v in cat.categories]
+        # Stable sort groups row positions by code; split at the code boundaries
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+        bitmaps = {}
+        for i, label in enumerate(labels):
+            positions = order[bounds[i]:bounds[i + 1]]
+            if len(positions):
+                bits = np.zeros(self.rows, dtype=bool)
+                bits[positions] = True
+                bitmaps[label] = np.packbits(bits)
+        self._bitmaps[col] = bitmaps
+        self._values[col] = sorted(bitmaps)
+
+    def options(self, col: str) -> list[str]:
+        """Sorted distinct values of ``col`` present in the frame."""
+        return list(self._values.get(col, []))
+
+    def search_styles(self, text: str) -> list[str]:
+        """Style numbers containing ``text`` (case-insensitive)."""
+        needle = text.lower()
+        styles = self._values.get("style_number", [])
+        if len(needle) < _NGRAM:
+            candidates: Iterable[int] = range(len(styles))
+        else:
+            sets = [self._style_ngrams.get(gram, set()) for gram in _ngrams(needle)]
+            candidates = sorted(set.intersection(*sets)) if all(sets) else ()
+        return [styles[i] for i in candidates if needle in self._styles_lower[i]]
+
+    def _union(self, col: str, values: Iterable[str]) -> np.ndarray:
+        bits = np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+        bitmaps = self._bitmaps.get(col, {})
+        for v in values:
+            bm = bitmaps.get(v)
+            if bm is not None:
+                bits |= bm
+        return bits
+
+    def mask(self, lines: tuple[str, ...] = (), cats: tuple[str, ...] = (),
+             styles: tuple[str, ...] = (), style_like: str = "") -> np.ndarray | None:
+        """Packed bitmap of matching rows, or None when no filter applies.
+
+        Same semantics as the server-side filters: an explicit ``styles``
+        list takes precedence over the ``style_like`` substring search.
+        """
+        selections = []
+        if lines:
+            selections.append(("line", lines))
+        if cats:
+            selections.append(("category", cats))
+        if styles:
+            selections.append(("style_number", styles))
+        elif style_like:
+            selections.append(("style_number", self.search_styles(style_like)))
+        if not selections:
+            return None
+        bits = self._union(*selections[0])
+        for col, values in selections[1:]:
+            bits &= self._union(col, values)
+        return bits
+
+    def filter(self, lines: tuple[str, ...] = (), cats: tuple[str, ...] = (),
+               styles: tuple[str, ...] = (), style_like: str = "") -> pd.DataFrame:
+        """Rows of the frame matching the filters (the frame itself when unfiltered)."""
+        bits = self.mask(lines, cats, styles, style_like)
+        if bits is None:
+            return self.frame
+        rows = np.flatnonzero(np.unpackbits(bits, count=self.rows))
+        return self.frame.take(rows).reset_index(drop=True)
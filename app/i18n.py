@@ -16,7 +16,9 @@ TRANSLATIONS = {
         "tab_summary": "요약",
         "tab_trend": "시간대 추이",
         "tab_detail": "시간대 상세",
+        "view": "보기",
         "hourly_trend": "시간대별 생산 추이",
+        "chart_range_total": "기간이 길어 시간대별 기간 합계로 표시합니다",
         "hourly_detail_by_style": "스타일별 시간대별 상세",
         "download_csv": "CSV 다운로드",
         "no_data": "해당 조건의 데이터가 없습니다.",
@@ -39,7 +41,9 @@ TRANSLATIONS = {
         "tab_summary": "Overview",
         "tab_trend": "Hourly Trend",
         "tab_detail": "Hourly Detail",
+        "view": "View",
         "hourly_trend": "Hourly Production Trend",
+        "chart_range_total": "Long range: showing the range total per time slot",
         "hourly_detail_by_style": "Hourly Details by Style",
         "download_csv": "Download CSV",
         "no_data": "No data for the selected filters.",
@@ -62,7 +66,9 @@ TRANSLATIONS = {
         "tab_summary": "Tổng quan",
         "tab_trend": "Xu hướng theo giờ",
         "tab_detail": "Chi tiết theo giờ",
+        "view": "Chế độ xem",
         "hourly_trend": "Xu hướng theo giờ",
+        "chart_range_total": "Khoảng thời gian dài: hiển thị tổng theo khung giờ",
         "hourly_detail_by_style": "Chi tiết theo giờ theo kiểu",
         "download_csv": "Tải CSV",
         "no_data": "Không có dữ liệu cho bộ lọc.",
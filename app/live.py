@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import logging
+import select
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+# Support running as package (app.*) or script (local modules)
+try:
+    from app import db  # type: ignore
+    from app.cache import get_cache  # type: ignore
+    from app.disk_cache import get_disk_cache  # type: ignore
+    from app.settings import setting  # type: ignore
+except ModuleNotFoundError:
+    import db  # type: ignore
+    from cache import get_cache  # type: ignore
+    from disk_cache import get_disk_cache  # type: ignore
+    from settings import setting  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Recent (seq, production_date, line) changes; line None means "any line"
+_changes: deque[tuple[int, str, Optional[str]]] = deque(maxlen=5000)
+_changes_lock = threading.Lock()
+_seq = 0
+
+
+def live_enabled() -> bool:
+    return setting("app", "live_updates", "LIVE_UPDATES", "false").strip().lower() in ("1", "true", "yes", "on")
+
+
+def current_seq() -> int:
+    with _changes_lock:
+        return _seq
+
+
+def _record(keys: set[tuple[str, Optional[str]]]) -> None:
+    global _seq
+    with _changes_lock:
+        for day, line in sorted(keys, key=lambda k: (k[0], k[1] or "")):
+            _seq += 1
+            _changes.append((_seq, day, line))
+
+
+def changed_since(seq: int, date_from: str, date_to: str, lines: tuple[str, ...] = ()) -> bool:
+    """True if any change after ``seq`` touches the date range and (if given) one of ``lines``."""
+    with _changes_lock:
+        if _seq <= seq:
+            return False
+        if not _changes or _changes[0][0] > seq + 1:
+            # The log rolled over past seq; assume the view is stale
+            return True
+        for s, day, line in reversed(_changes):
+            if s <= seq:
+                break
+            if date_from <= day <= date_to and (not lines or line is None or line in lines):
+                return True
+    return False
+
+
+def apply_changes(keys: set[tuple[str, Optional[str]]]) -> None:
+    """Push a batch of (production_date, line) changes into the shared cache and the change log."""
+    days = {day for day, _ in keys}
+    today = dt.date.today().isoformat()
+    if today in days:
+        try:
+            db.get_day_frame(today).refresh()
+        except Exception:
+            logger.exception("incremental refresh of %s failed", today)
+    get_cache().invalidate_days(days)
+    disk = get_disk_cache()
+    if disk is not None:
+        disk.invalidate_days(days)
+    _record(keys)
+
+
+class ChangeListener(threading.Thread):
+    """Background LISTEN loop on a dedicated connection.
+
+    Notifications are coalesced for ``debounce_s`` seconds and then applied
+    in one batch. On connection loss it reconnects with backoff and treats
+    today as changed, since notifications sent meanwhile are lost. Every
+    ``rollup_interval_s`` seconds it also rebuilds rollups for dirty past days.
+    """
+
+    def __init__(self, debounce_s: float = 1.0, poll_s: float = 1.0, rollup_interval_s: float = 300.0):
+        super().__init__(name="production-change-listener", daemon=True)
+        self.debounce_s = debounce_s
+        self.poll_s = poll_s
+        self.rollup_interval_s = rollup_interval_s
+        self._stop_event = threading.Event()
+        self._rollups_at = 0.0
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        backoff = 1.0
+        first = True
+        while not self._stop_event.is_set():
+            try:
+                conn = db.listen_connection()
+            except Exception:
+                logger.exception("listener connect failed; retrying in %.0fs", backoff)
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+                continue
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {db.NOTIFY_CHANNEL}")
+                if not first:
+                    apply_changes({(dt.date.today().isoformat(), None)})
+                first = False
+                backoff = 1.0
+                self._listen(conn)
+            except Exception:
+                logger.exception("listener connection lost")
+            finally:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+    def _listen(self, conn) -> None:
+        pending: set[tuple[str, Optional[str]]] = set()
+        pending_since = 0.0
+        while not self._stop_event.is_set():
+            if select.select([conn], [], [], self.poll_s) != ([], [], []):
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        payload = json.loads(notify.payload)
+                        key = (str(payload["production_date"]), payload.get("line"))
+                    except (ValueError, KeyError, TypeError):
+                        key = (dt.date.today().isoformat(), None)
+                    if not pending:
+                        pending_since = time.monotonic()
+                    pending.add(key)
+            if pending and time.monotonic() - pending_since >= self.debounce_s:
+                apply_changes(pending)
+                pending = set()
+            if time.monotonic() - self._rollups_at >= self.rollup_interval_s:
+                self._rollups_at = time.monotonic()
+                try:
+                    db.refresh_rollups()
+                except Exception:
+                    logger.exception("rollup refresh failed")
+
+
+_listener: Optional[ChangeListener] = None
+_listener_lock = threading.Lock()
+
+
+def start_listener(install_trigger: bool = False) -> ChangeListener:
+    """Start the process-wide listener once; optionally (re)install the NOTIFY trigger first.
+
+    The page only LISTENs: installing the trigger needs owner rights and locks
+    production_data, so it is done once with ``python -m app.schema notify``.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            if install_trigger:
+                try:
+                    db.install_notify_trigger()
+                except Exception:
+                    logger.exception("could not install NOTIFY trigger; listening anyway")
+            else:
+                try:
+                    if not db.notify_trigger_installed():
+                        logger.warning("NOTIFY trigger missing on %s; run `python -m app.schema notify` "
+                                       "to enable live updates", db._table_ident())
+                except Exception:
+                    logger.exception("could not check the NOTIFY trigger; listening anyway")
+            _listener = ChangeListener()
+            _listener.start()
+        return _listener
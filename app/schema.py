@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+from typing import Optional
+
+from sqlalchemy import event, text
+
+# Support running as package (app.*) or script (local modules)
+try:
+    from app import db  # type: ignore
+except ModuleNotFoundError:
+    import db  # type: ignore
+
+
+# Indexes for the production_data access paths: (name, column/opclass spec, method, needed extension).
+# The btree matches the date BETWEEN filter plus the ORDER BY; the trigram GIN
+# serves style_number ILIKE '%x%' substring search.
+INDEXES = (
+    ("production_data_date_line_style_idx", "(production_date, line, style_number)", "btree", None),
+    ("production_data_style_trgm_idx", "(style_number gin_trgm_ops)", "gin", "pg_trgm"),
+)
+
+
+def _disable_statement_timeout() -> None:
+    """Lift the app's statement_timeout on this process's connections.
+
+    Index builds and rollup backfills can outlast a timeout sized for page
+    queries, and a cancelled CREATE INDEX CONCURRENTLY leaves an INVALID index.
+    """
+    @event.listens_for(db.get_engine(), "connect")
+    def _no_timeout(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute("SET statement_timeout = 0")
+        cur.close()
+        # Commit so the pool's reset-on-return rollback does not undo the SET
+        dbapi_conn.commit()
+
+
+def _existing_indexes() -> list[dict]:
+    """Indexes on production_data with their definitions and validity."""
+    sql = text(
+        """
+        SELECT ic.relname AS name, pg_get_indexdef(i.indexrelid) AS definition, i.indisvalid AS valid
+        FROM pg_index i
+        JOIN pg_class ic ON ic.oid = i.indexrelid
+        JOIN pg_class tc ON tc.oid = i.indrelid
+        JOIN pg_namespace n ON n.oid = tc.relnamespace
+        WHERE n.nspname = :schema AND tc.relname = 'production_data'
+        """
+    )
+    with db.get_engine().connect() as conn:
+        return [dict(r) for r in conn.execute(sql, {"schema": db._get_schema()}).mappings()]
+
+
+def _matches(definition: str, spec: str, method: str) -> bool:
+    return f"USING {method} {spec}" in definition
+
+
+def verify_indexes() -> dict[str, str]:
+    """Status per recommended index: "ok", "invalid" (failed concurrent build) or "missing".
+
+    An existing index with another name but the same method and columns counts as present.
+    """
+    existing = _existing_indexes()
+    status = {}
+    for name, spec, method, _ in INDEXES:
+        found = [e for e in existing if e["name"] == name or _matches(e["definition"], spec, method)]
+        if not found:
+            status[name] = "missing"
+        else:
+            status[name] = "ok" if any(e["valid"] for e in found) else "invalid"
+    return status
+
+
+def ensure_indexes(concurrently: bool = True) -> dict[str, str]:
+    """Create missing (or rebuild invalid) recommended indexes; returns the resulting status per index.
+
+    Builds run CONCURRENTLY by default so writers are not blocked. An index whose
+    extension cannot be installed (not available or no privilege) is reported
+    as "skipped: ..." instead of failing the whole run.
+    """
+    table = db._table_ident()
+    schema = db._get_schema()
+    status = verify_indexes()
+    result = {}
+    with db.get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, spec, method, extension in INDEXES:
+            if status[name] == "ok":
+                result[name] = "ok"
+                continue
+            try:
+                if extension:
+                    conn.exec_driver_sql(f"CREATE EXTENSION IF NOT EXISTS {extension}")
+                if status[name] == "invalid":
+                    conn.exec_driver_sql(f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {schema}.{name}")
+                conn.exec_driver_sql(
+                    f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+                    f"ON {table} USING {method} {spec}"
+                )
+                result[name] = "created"
+            except Exception as e:
+                result[name] = "skipped: " + str(getattr(e, "orig", e)).strip().splitlines()[0]
+    return result
+
+
+def _plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _plan_nodes(child)
+
+
+def explain_check(date_from: Optional[str] = None, date_to: Optional[str] = None) -> list[dict]:
+    """EXPLAIN the fetch_production query shapes and flag sequential scans of production_data.
+
+    Defaults to the last 7 days. Returns one report per case:
+    {"case", "seq_scan", "scans": [(node type, index or None)], "total_cost"}.
+    On small tables a sequential scan can be the planner's right choice; the
+    report is meant to catch large tables where the indexes are not used.
+    """
+    today = dt.date.today()
+    date_to = date_to or today.isoformat()
+    date_from = date_from or (today - dt.timedelta(days=6)).isoformat()
+    cases = {
+        "date range": {},
+        "date + line": {"line": ["__probe__"]},
+        "date + style search": {"style_like": "probe"},
+        "date + style list": {"styles": ["__probe__"]},
+    }
+    reports = []
+    with db.get_engine().connect() as conn:
+        for case, filters in cases.items():
+            sql, params = db.production_query(date_from, date_to, **filters)
+            explain = text("EXPLAIN (FORMAT JSON) " + sql.text)
+            plan = conn.execute(explain, params).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            root = plan[0]["Plan"]
+            scans = [
+                (n["Node Type"], n.get("Index Name"))
+                for n in _plan_nodes(root)
+                if n.get("Relation Name") == "production_data" or n["Node Type"] == "Bitmap Index Scan"
+            ]
+            reports.append({
+                "case": case,
+                "seq_scan": any(kind == "Seq Scan" for kind, _ in scans),
+                "scans": scans,
+                "total_cost": root.get("Total Cost"),
+            })
+    return reports
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="production_data schema management")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("verify", help="report recommended index status")
+    ensure = sub.add_parser("ensure", help="create missing recommended indexes")
+    ensure.add_argument("--no-concurrently", action="store_true")
+    explain = sub.add_parser("explain", help="EXPLAIN self-check for sequential scans")
+    explain.add_argument("--from", dest="date_from")
+    explain.add_argument("--to", dest="date_to")
+    memory = sub.add_parser("memory", help="memory report of the compact production frame for a date range")
+    memory.add_argument("date_from")
+    memory.add_argument("date_to", nargs="?")
+    rollups = sub.add_parser("rollups", help="create rollup tables and rebuild a date range, or rebuild dirty days")
+    rollups.add_argument("date_from", nargs="?")
+    rollups.add_argument("date_to", nargs="?")
+    rollups.add_argument("--dirty", action="store_true",
+                         help="rebuild days changed since their last refresh (before today); run from cron")
+    sub.add_parser("notify", help="install the NOTIFY trigger used by live updates (needs table owner)")
+    args = parser.parse_args(argv)
+    _disable_statement_timeout()
+
+    if args.command == "verify":
+        status = verify_indexes()
+        for name, state in status.items():
+            print(f"{name}: {state}")
+        return 0 if all(v == "ok" for v in status.values()) else 1
+    if args.command == "ensure":
+        for name, state in ensure_indexes(concurrently=not args.no_concurrently).items():
+            print(f"{name}: {state}")
+        return 0
+    if args.command == "explain":
+        reports = explain_check(args.date_from, args.date_to)
+        for r in reports:
+            flag = "SEQ SCAN" if r["seq_scan"] else "ok"
+            print(f"{r['case']}: {flag} cost={r['total_cost']} scans={r['scans']}")
+        return 1 if any(r["seq_scan"] for r in reports) else 0
+    if args.command == "memory":
+        report = db.memory_report(db.fetch_production_frame(args.date_from, args.date_to))
+        for name, (used, plain, dtype) in report["columns"].items():
+            print(f"{name}: {dtype} {used:,} B (plain {plain:,} B)")
+        print(f"{report['rows']:,} rows: {report['bytes']:,} B vs plain {report['plain_bytes']:,} B "
+              f"({report['ratio']:.1f}x smaller)")
+        return 0
+    if args.command == "rollups":
+        if args.dirty:
+            if args.date_from:
+                parser.error("rollups: give either --dirty or a date range")
+            days = db.refresh_rollups()
+            print(f"rebuilt {len(days)} dirty day(s)")
+            return 0
+        if not args.date_from:
+            parser.error("rollups: a date range or --dirty is required")
+        start = dt.date.fromisoformat(args.date_from)
+        end = dt.date.fromisoformat(args.date_to or args.date_from)
+        db.ensure_rollups()
+        days = db.refresh_rollups([(start + dt.timedelta(days=i)).isoformat() for i in range((end - start).days + 1)])
+        print(f"rebuilt {len(days)} day(s)")
+        return 0
+    if args.command == "notify":
+        db.install_notify_trigger()
+        print(f"installed NOTIFY trigger on {db._table_ident()} (channel {db.NOTIFY_CHANNEL})")
+        return 0
+    return 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
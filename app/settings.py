@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+import os
+from typing import Optional
+
+
+def setting(block: str, key: str, env: str, default: Optional[str] = None) -> Optional[str]:
+    """Read an optional setting from the ``block`` secrets block, then the environment."""
+    try:
+        import streamlit as st  # type: ignore
+
+        value = st.secrets.get(block, {}).get(key)
+        if value is not None:
+            return str(value)
+    except Exception:
+        pass
+    return os.getenv(env, default)
@@ -0,0 +1,384 @@
+from __future__ import annotations
+
+import abc
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+# Payload layout: kind, expires_at (wall clock, 0 = never), metadata length, metadata JSON, body
+_HEADER = struct.Struct("<cdI")
+_ARROW = b"A"
+_PICKLE = b"P"
+
+
+def encode(value: Any, expires_at: Optional[float], meta: dict) -> bytes:
+    """Serialize a cached value: DataFrames as zstd-compressed Arrow IPC, anything else as zlib pickle."""
+    meta_bytes = json.dumps(meta).encode("utf-8")
+    if isinstance(value, pd.DataFrame):
+        try:
+            table = pa.Table.from_pandas(value)
+            sink = pa.BufferOutputStream()
+            options = pa.ipc.IpcWriteOptions(compression="zstd")
+            with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+            body = sink.getvalue().to_pybytes()
+            return _HEADER.pack(_ARROW, expires_at or 0.0, len(meta_bytes)) + meta_bytes + body
+        except (pa.ArrowException, TypeError, ValueError):
+            pass
+    body = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    return _HEADER.pack(_PICKLE, expires_at or 0.0, len(meta_bytes)) + meta_bytes + body
+
+
+def decode(payload: bytes) -> tuple[Any, Optional[float], dict]:
+    """Inverse of encode(): (value, expires_at or None, meta)."""
+    kind, expires_at, meta_len = _HEADER.unpack_from(payload)
+    start = _HEADER.size + meta_len
+    meta = json.loads(payload[_HEADER.size:start].decode("utf-8"))
+    body = memoryview(payload)[start:]
+    if kind == _ARROW:
+        value = pa.ipc.open_stream(pa.py_buffer(body)).read_all().to_pandas()
+    else:
+        value = pickle.loads(zlib.decompress(body))
+    return value, (expires_at or None), meta
+
+
+class CacheBackend(abc.ABC):
+    """Byte store shared by app processes/nodes, behind the in-process ResultCache.
+
+    Keys and tags are strings; ``ttl`` is in seconds (None = no expiry).
+    Tags group keys for invalidation (partition, production_date).
+    Payloads are pickled for non-DataFrame values, so a backend must only
+    be shared between trusted app nodes.
+    """
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Payload stored under ``key``, or None when missing or expired."""
+
+    @abc.abstractmethod
+    def set(self, key: str, payload: bytes, ttl: Optional[float], tags: Iterable[str] = ()) -> None:
+        """Store ``payload`` for ``ttl`` seconds and add ``key`` to every tag in ``tags``."""
+
+    @abc.abstractmethod
+    def invalidate_tag(self, tag: str) -> int:
+        """Delete every key stored with ``tag``; returns the number of keys dropped."""
+
+
+class MemoryBackend(CacheBackend):
+    """In-process backend: shares nothing across processes; for tests and as a stand-in.
+
+    Holds at most ``max_bytes`` of payloads (oldest writes are dropped
+    first); expired entries are swept every ``sweep_interval`` seconds.
+    """
+
+    def __init__(self, max_bytes: int = 256 << 20, sweep_interval: float = 60.0):
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        # key -> (payload, expires_at or None, tags), in write order
+        self._values: OrderedDict[str, tuple[bytes, Optional[float], frozenset[str]]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._bytes = 0
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] <= time.monotonic():
+                self._remove(key)
+                return None
+            return entry[0]
+
+    def set(self, key: str, payload: bytes, ttl: Optional[float], tags: Iterable[str] = ()) -> None:
+        if len(payload) > self.max_bytes:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if key in self._values:
+                self._remove(key)
+            tags = frozenset(tags)
+            self._values[key] = (payload, now + ttl if ttl is not None else None, tags)
+            self._bytes += len(payload)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            if now >= self._next_sweep:
+                self._sweep(now)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._values)))
+
+    def invalidate_tag(self, tag: str) -> int:
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            self._tags.pop(tag, None)
+            return len(keys)
+
+    def sweep(self) -> int:
+        """Drop expired entries now; returns the count dropped."""
+        with self._lock:
+            return self._sweep(time.monotonic())
+
+    def _sweep(self, now: float) -> int:
+        expired = [k for k, e in self._values.items() if e[1] is not None and e[1] <= now]
+        for key in expired:
+            self._remove(key)
+        self._next_sweep = now + self.sweep_interval
+        return len(expired)
+
+    def _remove(self, key: str) -> None:
+        payload, _, tags = self._values.pop(key)
+        self._bytes -= len(payload)
+        for tag in tags:
+            members = self._tags.get(tag)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self._tags[tag]
+
+
+class DiskBackend(CacheBackend):
+    """Files under ``root`` (e.g. a volume shared by the nodes).
+
+    Each key is one ``values/<hash>.bin`` file that starts with its expiry
+    (8-byte wall-clock time, 0 = never) and is written to a temp name and
+    renamed into place. A tag is a directory of empty marker files named
+    like the values it lists, so storing a key again never grows it. Every
+    ``sweep_interval`` seconds a set() also deletes expired values, the
+    oldest values beyond ``max_bytes`` and markers of deleted values.
+    """
+
+    _EXPIRY = struct.Struct("<d")
+
+    def __init__(self, root: str, max_bytes: int = 1 << 30, sweep_interval: float = 60.0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._values_dir = os.path.join(root, "values")
+        self._tags_dir = os.path.join(root, "tags")
+        os.makedirs(self._values_dir, exist_ok=True)
+        os.makedirs(self._tags_dir, exist_ok=True)
+        self._sweep_lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    @staticmethod
+    def _name(key: str) -> str:
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self._values_dir, name + ".bin")
+
+    def _tag_dir(self, tag: str) -> str:
+        return os.path.join(self._tags_dir, self._name(tag))
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(self._name(key)), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        (expires_at,) = self._EXPIRY.unpack_from(data)
+        if expires_at and expires_at <= time.time():
+            return None
+        return data[self._EXPIRY.size:]
+
+    def set(self, key: str, payload: bytes, ttl: Optional[float], tags: Iterable[str] = ()) -> None:
+        name = self._name(key)
+        path = self._path(name)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(self._EXPIRY.pack(time.time() + ttl if ttl is not None else 0.0))
+                f.write(payload)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        for tag in tags:
+            self._mark(self._tag_dir(tag), name)
+        if time.monotonic() >= self._next_sweep and self._sweep_lock.acquire(blocking=False):
+            try:
+                self._next_sweep = time.monotonic() + self.sweep_interval
+                self.sweep()
+            finally:
+                self._sweep_lock.release()
+
+    def _mark(self, tag_dir: str, name: str) -> None:
+        marker = os.path.join(tag_dir, name)
+        # Retry once: an invalidation or sweep may remove the directory in between
+        for _ in range(2):
+            os.makedirs(tag_dir, exist_ok=True)
+            try:
+                with open(marker, "a"):
+                    pass
+                os.utime(marker)
+                return
+            except FileNotFoundError:
+                continue
+
+    def invalidate_tag(self, tag: str) -> int:
+        tag_dir = self._tag_dir(tag)
+        # Move the tag aside first; keys stored from now on start a new tag directory
+        doomed = f"{tag_dir}.{os.getpid()}.{threading.get_ident()}.invalidated"
+        try:
+            os.rename(tag_dir, doomed)
+        except OSError:
+            return 0
+        dropped = 0
+        for name in os.listdir(doomed):
+            try:
+                os.remove(self._path(name))
+                dropped += 1
+            except OSError:
+                pass
+        shutil.rmtree(doomed, ignore_errors=True)
+        return dropped
+
+    def sweep(self) -> int:
+        """Delete expired values, the oldest values beyond max_bytes and stale tag markers; returns values deleted."""
+        now = time.time()
+        removed = 0
+        live = []
+        for entry in os.scandir(self._values_dir):
+            try:
+                stat = entry.stat()
+                if not entry.name.endswith(".bin"):
+                    # Temp file left by a crashed writer
+                    if stat.st_mtime < now - 3600:
+                        os.remove(entry.path)
+                    continue
+                with open(entry.path, "rb") as f:
+                    head = f.read(self._EXPIRY.size)
+                expired = len(head) < self._EXPIRY.size or 0 < self._EXPIRY.unpack(head)[0] <= now
+                if expired:
+                    os.remove(entry.path)
+                    removed += 1
+                else:
+                    live.append((stat.st_mtime, stat.st_size, entry.path))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in live)
+        for _, size, path in sorted(live):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+            total -= size
+        for tag_entry in os.scandir(self._tags_dir):
+            if "." in tag_entry.name:
+                continue
+            for marker in os.scandir(tag_entry.path):
+                try:
+                    # Grace period: a marker touched since the last sweep may belong to a value being written
+                    if not os.path.exists(self._path(marker.name)) and marker.stat().st_mtime < now - self.sweep_interval:
+                        os.remove(marker.path)
+                except OSError:
+                    pass
+            try:
+                os.rmdir(tag_entry.path)
+            except OSError:
+                pass
+        return removed
+
+
+class RedisBackend(CacheBackend):
+    """Redis-protocol server (Redis >= 7, Valkey, ...) shared by all app nodes.
+
+    ``client`` is a redis-py compatible client (``redis.Redis`` or a fake
+    such as fakeredis). Values use SET ... PX; tags are sets of keys whose
+    TTL is only ever extended, so a tag outlives its longest-lived member.
+    """
+
+    # Tag lifetime for members without a TTL (a plain PERSIST could not be told apart from a new set)
+    _FOREVER_MS = 10 * 365 * 24 * 3600 * 1000
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        try:
+            import redis  # type: ignore
+        except ImportError as e:
+            raise RuntimeError("cache backend 'redis' requires the redis package (pip install redis).") from e
+        return cls(redis.Redis.from_url(url, socket_timeout=2.0, socket_connect_timeout=2.0))
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, payload: bytes, ttl: Optional[float], tags: Iterable[str] = ()) -> None:
+        ttl_ms = max(1, int(ttl * 1000)) if ttl is not None else None
+        pipe = self.client.pipeline(transaction=True)
+        if ttl_ms is not None:
+            pipe.set(key, payload, px=ttl_ms)
+        else:
+            pipe.set(key, payload)
+        tag_ms = ttl_ms if ttl_ms is not None else self._FOREVER_MS
+        for tag in tags:
+            pipe.sadd(tag, key)
+            # NX gives a new tag set its TTL; GT only extends an existing one
+            pipe.pexpire(tag, tag_ms, nx=True)
+            pipe.pexpire(tag, tag_ms, gt=True)
+        pipe.execute()
+
+    def invalidate_tag(self, tag: str) -> int:
+        # Read and delete the tag in one transaction so no member added meanwhile is lost
+        pipe = self.client.pipeline(transaction=True)
+        pipe.smembers(tag)
+        pipe.delete(tag)
+        keys, _ = pipe.execute()
+        if not keys:
+            return 0
+        return int(self.client.delete(*keys))
+
+
+class SharedTier:
+    """Namespaced view of a CacheBackend used by ResultCache: hashes keys and prefixes tags."""
+
+    def __init__(self, backend: CacheBackend, namespace: str = "production-dashboard"):
+        self.backend = backend
+        self.namespace = namespace
+
+    def key(self, key: Any) -> str:
+        return f"{self.namespace}:{hashlib.sha1(repr(key).encode('utf-8')).hexdigest()}"
+
+    def tag(self, name: str) -> str:
+        return f"{self.namespace}:tag:{name}"
+
+
+def make_backend(kind: str, url: str = "", directory: str = "", max_bytes: int = 1 << 30) -> Optional[CacheBackend]:
+    """Backend by name: "" / "none" (no shared tier), "memory", "disk" (``directory``) or "redis" (``url``).
+
+    ``max_bytes`` caps the memory and disk backends; a Redis server is capped by its own maxmemory.
+    """
+    kind = kind.strip().lower()
+    if kind in ("", "none"):
+        return None
+    if kind == "memory":
+        return MemoryBackend(max_bytes=max_bytes)
+    if kind == "disk":
+        if not directory:
+            raise RuntimeError("cache backend 'disk' needs cache.backend_dir (CACHE_BACKEND_DIR).")
+        return DiskBackend(os.path.expanduser(directory), max_bytes=max_bytes)
+    if kind == "redis":
+        return RedisBackend.from_url(url or "redis://localhost:6379/0")
+    raise RuntimeError(f"Unknown cache backend {kind!r}; expected memory, disk or redis.")
@@ -1,20 +1,66 @@
 from __future__ import annotations
 
+import codecs
 import datetime as dt
-import io
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 import altair as alt
+import numpy as np
 import pandas as pd
 import streamlit as st
 
 # Support running as package (app.*) or script (local modules)
 try:
-    from app.db import fetch_production  # type: ignore
+    from app.db import (  # type: ignore
+        HOUR_COLUMNS,
+        compact_frame,
+        copy_production_csv,
+        daily_kpis_arrow,
+        fetch_filter_options,
+        fetch_daily_kpis,
+        fetch_hourly_totals,
+        fetch_production_arrow,
+        fetch_production_frame,
+        fetch_style_hour_grid,
+        fetch_top_styles,
+        filter_arrow,
+        frame_from_arrow,
+        get_day_frame,
+        hourly_totals_arrow,
+        invalidate_schema_cache,
+    )
     from app.i18n import t, TRANSLATIONS  # type: ignore
+    from app.cache import cached_by_day, cached_query, get_cache, start_refresher  # type: ignore
+    from app.live import changed_since, current_seq, live_enabled, start_listener  # type: ignore
+    from app.disk_cache import get_disk_cache  # type: ignore
 except ModuleNotFoundError:
-    from db import fetch_production  # type: ignore
+    from db import (  # type: ignore
+        HOUR_COLUMNS,
+        compact_frame,
+        copy_production_csv,
+        daily_kpis_arrow,
+        fetch_filter_options,
+        fetch_daily_kpis,
+        fetch_hourly_totals,
+        fetch_production_arrow,
+        fetch_production_frame,
+        fetch_style_hour_grid,
+        fetch_top_styles,
+        filter_arrow,
+        frame_from_arrow,
+        get_day_frame,
+        hourly_totals_arrow,
+        invalidate_schema_cache,
+    )
     from i18n import t, TRANSLATIONS  # type: ignore
+    from cache import cached_by_day, cached_query, get_cache, start_refresher  # type: ignore
+    from live import changed_since, current_seq, live_enabled, start_listener  # type: ignore
+    from disk_cache import get_disk_cache  # type: ignore
+
+logger = logging.getLogger(__name__)
 
 
 # Page config
@@ -127,122 +173,405 @@ def apply_responsive_styles():
     st.markdown(MOBILE_STYLE, unsafe_allow_html=True)
 
 
-def get_locale() -> str:
+def _app_setting(key: str, default):
+    # secrets의 [app] 블록 값 (없으면 default)
     app_cfg = st.secrets.get("app", {}) if hasattr(st, "secrets") else {}
-    default_locale = app_cfg.get("default_locale", "KO")
-    return st.session_state.get("locale", default_locale)
+    return app_cfg.get(key, default)
+
+
+def get_locale() -> str:
+    return st.session_state.get("locale", _app_setting("default_locale", "KO"))
 
 
 def set_locale(loc: str):
     st.session_state["locale"] = loc
 
 
-@st.cache_data(ttl=60)
-def load_data(date_from: str, date_to: Optional[str] = None) -> pd.DataFrame:
-    # 서버 쿼리는 기간만 필터링하고, 라인/카테고리/스타일은 클라이언트에서 필터링
-    rows = fetch_production(date_from, date_to, line=None, category=None, style_like=None)
+def _db_filters(lines: tuple[str, ...], cats: tuple[str, ...], styles: tuple[str, ...], style_like: str) -> dict:
+    return {"line": list(lines), "category": list(cats), "styles": list(styles), "style_like": style_like or None}
+
+
+def to_label(x: str) -> str:
+    # Map t_0830 -> 08:30 etc.
+    if x == "overtime":
+        return "OT"
+    t = x.replace("t_", "")
+    return f"{t[:2]}:{t[2:]}"
+
+
+# 시간대 라벨은 한 번만 만들고 고정 순서의 categorical로 공유 (차트/그리드 공통)
+TIME_LABELS = {c: to_label(c) for c in HOUR_COLUMNS}
+TIME_SLOT = pd.CategoricalDtype(list(TIME_LABELS.values()), ordered=True)
+
+
+# 오늘 데이터는 증분 프레임에서 가져오며, 이 시간(초)보다 오래되면 변경분만 다시 조회
+TODAY_DELTA_MAX_AGE = 5.0
+
+
+def split_today(date_from: str, date_to: Optional[str]) -> tuple[Optional[str], Optional[str]]:
+    """Return (last history day or None, today or None) covered by the range."""
+    date_to = date_to or date_from
+    today = dt.date.today()
+    hist_to = min(dt.date.fromisoformat(date_to), today - dt.timedelta(days=1)).isoformat()
+    in_range = date_from <= today.isoformat() <= date_to
+    return (hist_to if date_from <= hist_to else None), (today.isoformat() if in_range else None)
+
+
+def fetch_mode() -> str:
+    # 원본 행 조회 방식: "frame"(named cursor 배치 변환) 또는 "arrow"(COPY -> pyarrow CSV 리더)
+    return str(_app_setting("fetch_mode", "frame")).lower()
+
+
+def today_rows(lines: tuple[str, ...], cats: tuple[str, ...], styles: tuple[str, ...], style_like: str) -> pd.DataFrame:
+    today = dt.date.today().isoformat()
+    # 서버 쿼리(_build_filters)와 같은 의미로, 미리 만든 비트맵 인덱스로 필터링
+    return get_day_frame(today).index(max_age=TODAY_DELTA_MAX_AGE).filter(lines, cats, styles, style_like)
+
+
+def history_table(date_from: str, hist_to: str, lines: tuple[str, ...], cats: tuple[str, ...],
+                  styles: tuple[str, ...], style_like: str):
+    # 디스크 캐시(일자별 파일)의 지난 날짜 원본을 Arrow 상태로 필터링 (디스크 캐시가 켜져 있을 때만)
+    return filter_arrow(get_disk_cache().load_range(date_from, hist_to), lines, cats, styles, style_like)
+
+
+def history_rows(date_from: str, hist_to: str, lines: tuple[str, ...], cats: tuple[str, ...],
+                 styles: tuple[str, ...], style_like: str) -> pd.DataFrame:
+    # 지난 날짜 원본 행: 디스크 캐시가 있으면 DB 대신 사용
+    if get_disk_cache() is not None:
+        return frame_from_arrow(history_table(date_from, hist_to, lines, cats, styles, style_like))
+    filters = _db_filters(lines, cats, styles, style_like)
+    if fetch_mode() == "arrow":
+        return frame_from_arrow(fetch_production_arrow(date_from, hist_to, **filters))
+    return fetch_production_frame(date_from, hist_to, **filters)
+
+
+def daily_kpi_rows(df: pd.DataFrame) -> list[dict]:
+    # 원본 행에서 일자별 KPI 구성요소 계산 (daily_kpis_query와 같은 의미, 행이 있는 날짜만)
+    if df.empty:
+        return []
+    g = df.groupby(df["production_date"].dt.date, sort=True)
+    out = pd.DataFrame({
+        "row_count": g.size(),
+        "total_output": g["daily_production_total"].sum().astype("int64"),
+        "avg_hourly_sum": g["average_hourly"].sum().astype(float),
+        "avg_hourly_n": g["average_hourly"].count(),
+    })
+    return out.rename_axis("production_date").reset_index().to_dict("records")
+
+
+def daily_hourly_rows(df: pd.DataFrame) -> list[dict]:
+    # 원본 행에서 일자별 시간대 합계 계산 (hourly_totals_query와 같은 의미)
+    if df.empty:
+        return []
+    sums = df.groupby(df["production_date"].dt.date, sort=True)[list(HOUR_COLUMNS)].sum().astype("int64")
+    return sums.rename_axis("production_date").reset_index().to_dict("records")
+
+
+@cached_by_day
+def load_data(date_from: str, date_to: Optional[str] = None, lines: tuple[str, ...] = (),
+              cats: tuple[str, ...] = (), styles: tuple[str, ...] = (), style_like: str = "") -> pd.DataFrame:
+    # 라인/카테고리/스타일 필터를 서버 쿼리로 전달하여 선택 범위만큼만 전송 (일자별 캐시)
+    hist_to, today = split_today(date_from, date_to)
+    parts = []
+    if hist_to:
+        parts.append(history_rows(date_from, hist_to, lines, cats, styles, style_like))
+    if today:
+        parts.append(today_rows(lines, cats, styles, style_like))
+    if not parts:
+        return pd.DataFrame(columns=["production_date"])
+    # 카테고리 집합이 다른 프레임을 합치면 object로 풀리므로 다시 압축 dtype으로
+    return compact_frame(pd.concat(parts, ignore_index=True)) if len(parts) > 1 else parts[0]
+
+
+@cached_query
+def load_filter_options(date_from: str, date_to: Optional[str] = None) -> dict[str, list[str]]:
+    # 지난 기간은 DB DISTINCT, 오늘은 인덱스의 정렬된 옵션 목록 사용
+    hist_to, today = split_today(date_from, date_to)
+    options = fetch_filter_options(date_from, hist_to) if hist_to else {}
+    if today:
+        index = get_day_frame(today).index(max_age=TODAY_DELTA_MAX_AGE)
+        for col in ("line", "category", "style_number"):
+            today_values = index.options(col)
+            options[col] = sorted(set(options.get(col, [])).union(today_values)) if col in options else today_values
+    return options
+
+
+@cached_by_day
+def load_daily_kpis(date_from: str, date_to: Optional[str] = None, lines: tuple[str, ...] = (),
+                    cats: tuple[str, ...] = (), styles: tuple[str, ...] = (), style_like: str = "") -> pd.DataFrame:
+    hist_to, today = split_today(date_from, date_to)
+    rows = []
+    if hist_to and get_disk_cache() is not None:
+        rows = daily_kpis_arrow(history_table(date_from, hist_to, lines, cats, styles, style_like))
+    elif hist_to:
+        rows = fetch_daily_kpis(date_from, hist_to, **_db_filters(lines, cats, styles, style_like))
+    if today:
+        rows = [*rows, *daily_kpi_rows(today_rows(lines, cats, styles, style_like))]
+    return pd.DataFrame(rows, columns=["production_date", "row_count", "total_output", "avg_hourly_sum", "avg_hourly_n"])
+
+
+def load_kpis(**query) -> dict:
+    # 일자별 KPI 구성요소를 합산 (이미 조회한 날짜는 캐시 재사용)
+    daily = load_daily_kpis(**query)
+    avg_n = int(daily["avg_hourly_n"].sum()) if not daily.empty else 0
+    return {
+        "row_count": int(daily["row_count"].sum()) if not daily.empty else 0,
+        "total_output": int(daily["total_output"].sum()) if not daily.empty else 0,
+        "avg_hourly": float(daily["avg_hourly_sum"].astype(float).sum()) / avg_n if avg_n else 0.0,
+    }
+
+
+@cached_query
+def load_top_styles(date_from: str, date_to: Optional[str] = None, lines: tuple[str, ...] = (),
+                    cats: tuple[str, ...] = (), styles: tuple[str, ...] = (), style_like: str = "") -> pd.DataFrame:
+    rows = fetch_top_styles(date_from, date_to, **_db_filters(lines, cats, styles, style_like))
+    return pd.DataFrame(rows, columns=["style_number", "daily_production_total"])
+
+
+@cached_by_day
+def load_daily_hourly(date_from: str, date_to: Optional[str] = None, lines: tuple[str, ...] = (),
+                      cats: tuple[str, ...] = (), styles: tuple[str, ...] = (), style_like: str = "") -> pd.DataFrame:
+    # 서버에서 날짜별 시간대 합계(wide)를 받아 일자별로 캐시
+    hist_to, today = split_today(date_from, date_to)
+    rows = []
+    if hist_to and get_disk_cache() is not None:
+        rows = hourly_totals_arrow(history_table(date_from, hist_to, lines, cats, styles, style_like))
+    elif hist_to:
+        rows = fetch_hourly_totals(date_from, hist_to, **_db_filters(lines, cats, styles, style_like))
+    if today:
+        rows = [*rows, *daily_hourly_rows(today_rows(lines, cats, styles, style_like))]
+    return pd.DataFrame(rows, columns=["production_date", *HOUR_COLUMNS])
+
+
+@cached_query
+def load_hourly_totals(date_from: str, date_to: Optional[str] = None, lines: tuple[str, ...] = (),
+                       cats: tuple[str, ...] = (), styles: tuple[str, ...] = (), style_like: str = "") -> pd.DataFrame:
+    # 차트용 long 포맷으로 변환 (필터 조합별로 캐시)
+    wide = load_daily_hourly(date_from, date_to, lines, cats, styles, style_like)
+    if wide.empty:
+        return pd.DataFrame()
+    # melt 없이 wide 값 배열을 펼쳐 (일자, 시간대) 순서의 long 프레임 구성
+    qty = wide[list(HOUR_COLUMNS)].to_numpy(dtype="int64", na_value=0)
+    n_days, n_slots = qty.shape
+    return pd.DataFrame({
+        "production_date": np.repeat(wide["production_date"].to_numpy(), n_slots),
+        "time_label": pd.Categorical.from_codes(np.tile(np.arange(n_slots), n_days), dtype=TIME_SLOT),
+        "qty": qty.ravel(),
+    })
+
+
+@cached_query
+def load_style_hour_grid(date_from: str, date_to: Optional[str] = None, lines: tuple[str, ...] = (),
+                         cats: tuple[str, ...] = (), styles: tuple[str, ...] = (), style_like: str = "") -> pd.DataFrame:
+    rows = fetch_style_hour_grid(date_from, date_to, **_db_filters(lines, cats, styles, style_like))
     if not rows:
         return pd.DataFrame()
-    df = pd.DataFrame(rows)
-    return df
+    piv = pd.DataFrame(rows, columns=["style_number", *HOUR_COLUMNS]).set_index("style_number")
+    return piv.rename(columns=TIME_LABELS)
+
+
+@cached_query
+def load_detail_grid(date_from: str, date_to: Optional[str] = None, lines: tuple[str, ...] = (),
+                     cats: tuple[str, ...] = (), styles: tuple[str, ...] = (), style_like: str = "") -> pd.DataFrame:
+    # 스타일 x 시간대 그리드에 합계 열을 붙이고 Top 스타일 순으로 정렬 (필터 조합별로 캐시)
+    piv = load_style_hour_grid(date_from, date_to, lines, cats, styles, style_like)
+    if piv.empty:
+        return piv
+    piv = piv.copy()
+    piv["Total"] = piv.sum(axis=1)
+    style_order = load_top_styles(date_from, date_to, lines, cats, styles, style_like)["style_number"].tolist()
+    top_idx = [s for s in style_order if s in piv.index]
+    if top_idx:
+        piv = pd.concat([piv.loc[top_idx], piv.drop(index=top_idx, errors="ignore")])
+    return piv.reset_index()
 
 
-def melt_hourly(df: pd.DataFrame) -> pd.DataFrame:
-    hour_cols = [
-        "t_0830", "t_0930", "t_1000", "t_1130", "t_1330", "t_1430", "t_1530", "t_1630", "t_1730", "t_1800", "overtime",
-    ]
-    present = [c for c in hour_cols if c in df.columns]
-    if not present:
-        return pd.DataFrame()
-    m = df.melt(id_vars=["production_date", "line", "style_number"], value_vars=present, var_name="time", value_name="qty")
-    # Map t_0830 -> 08:30 etc.
-    def to_label(x: str) -> str:
-        if x == "overtime":
-            return "OT"
-        t = x.replace("t_", "")
-        return f"{t[:2]}:{t[2:]}"
+def chart_max_series() -> int:
+    # 추이 차트에 일자별 선으로 그리는 최대 일수; 넘으면 기간 합계 한 줄로 집계
+    return int(_app_setting("chart_max_series", 7))
+
+
+def chart_spec_max_kb() -> int:
+    # 브라우저로 보내는 차트 데이터 크기 상한 (KB)
+    return int(_app_setting("chart_spec_max_kb", 256))
+
+
+def trend_points(hourly: pd.DataFrame, max_series: int) -> pd.DataFrame:
+    """Exactly the points the trend chart draws.
+
+    Up to ``max_series`` days: one line per day, columns (day, time_label, qty).
+    Longer ranges collapse to the range total per time slot: (time_label, qty).
+    """
+    if hourly.empty:
+        return hourly
+    if hourly["production_date"].nunique() <= max_series:
+        return pd.DataFrame({
+            "day": pd.to_datetime(hourly["production_date"]).dt.strftime("%m-%d"),
+            "time_label": hourly["time_label"],
+            "qty": hourly["qty"],
+        })
+    return hourly.groupby("time_label", observed=False, as_index=False)["qty"].sum()
+
+
+@cached_query
+def load_trend_points(date_from: str, date_to: Optional[str] = None, lines: tuple[str, ...] = (),
+                      cats: tuple[str, ...] = (), styles: tuple[str, ...] = (), style_like: str = "",
+                      max_series: int = 7) -> pd.DataFrame:
+    # 차트에 그릴 점만 미리 집계해 캐시 (spec에 들어가는 데이터 최소화)
+    return trend_points(load_hourly_totals(date_from, date_to, lines, cats, styles, style_like), max_series)
+
+
+def load_trend(**query) -> pd.DataFrame:
+    return load_trend_points(**query, max_series=chart_max_series())
+
 
-    m["time_label"] = m["time"].map(to_label)
-    agg = m.groupby(["production_date", "time_label"], as_index=False)["qty"].sum()
-    return agg
+# 탭(뷰)별 로더: 선택된 뷰의 데이터만 조회/가공
+VIEW_LOADERS = {
+    "summary": load_top_styles,
+    "trend": load_trend,
+    "detail": load_detail_grid,
+}
+
+
+def active_view() -> str:
+    return st.session_state.get("_view") or "summary"
+
+
+# 대시보드 로더 병렬 실행용 (세션 간 공유, DB 풀 크기보다 작게 유지)
+_loader_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dashboard-loader")
+
+
+def load_dashboard(**query) -> dict:
+    """KPI와 현재 선택된 뷰의 데이터를 동시에 조회 (캐시 로더 그대로 사용, 다른 뷰는 조회하지 않음)."""
+    view = active_view()
+    futures = {
+        "kpis": _loader_pool.submit(load_kpis, **query),
+        view: _loader_pool.submit(VIEW_LOADERS[view], **query),
+    }
+    return {name: f.result() for name, f in futures.items()}
+
+
+def copy_export_min_rows() -> int:
+    # 이 행 수 이상이면 DataFrame 대신 PostgreSQL COPY로 CSV 생성
+    return int(_app_setting("copy_export_min_rows", 50_000))
+
+
+def build_csv(query: dict, row_count: int) -> bytes:
+    """CSV payload for the download button (UTF-8 with BOM for Excel).
 
+    Called lazily by st.download_button only when the user clicks it. Large
+    exports are streamed by COPY into an unbuffered temp file instead of going
+    through a DataFrame and an in-memory CSV string.
+    """
+    if row_count < copy_export_min_rows():
+        df = load_data(**query)
+        return df.to_csv(index=False).encode("utf-8-sig")
+    with tempfile.TemporaryFile(buffering=0) as out:
+        out.write(codecs.BOM_UTF8)
+        copy_production_csv(out, query["date_from"], query["date_to"],
+                            **_db_filters(query["lines"], query["cats"], query["styles"], query["style_like"]))
+        out.seek(0)
+        return out.readall()
 
-def kpi_cards(locale: str, df: pd.DataFrame):
-    total_output = int(df["daily_production_total"].fillna(0).sum()) if "daily_production_total" in df else 0
-    avg_hourly = float(df["average_hourly"].dropna().mean()) if "average_hourly" in df else 0.0
+
+def kpi_cards(locale: str, kpis: dict):
+    total_output = int(kpis.get("total_output", 0))
+    avg_hourly = float(kpis.get("avg_hourly", 0.0))
 
     c1, c2 = st.columns(2)
     c1.metric(t(locale, "kpi_total_output"), f"{total_output:,}")
     c2.metric(t(locale, "kpi_avg_hourly"), f"{avg_hourly:,.2f}")
 
 
-def top_styles_table(locale: str, df: pd.DataFrame) -> list[str]:
-    if df.empty:
-        return []
-    cols = ["style_number", "daily_production_total"]
-    present = [c for c in cols if c in df.columns]
-    if len(present) < 2:
-        return []
-    topn = df.groupby("style_number", as_index=False)["daily_production_total"].sum().sort_values("daily_production_total", ascending=False).head(10)
+def top_styles_table(locale: str, topn: pd.DataFrame):
+    if topn.empty:
+        return
     st.subheader(t(locale, "top_styles"))
     st.dataframe(topn, hide_index=True, use_container_width=True)
-    return topn["style_number"].tolist()
 
 
-def hourly_chart(locale: str, df: pd.DataFrame):
-    melted = melt_hourly(df)
-    if melted.empty:
+def chart_data_bytes(points: pd.DataFrame) -> int:
+    # Vega-Lite spec에 인라인으로 들어가는 데이터(JSON 레코드) 크기
+    return len(points.to_json(orient="records").encode("utf-8"))
+
+
+def hourly_chart(locale: str, points: pd.DataFrame):
+    # points: trend_points() 결과 (이미 집계된 그릴 점만 포함)
+    if points.empty:
         return
+    size = chart_data_bytes(points)
+    limit = chart_spec_max_kb() * 1024
+    if size > limit and "day" in points:
+        # 크기 초과 시 일자별 선을 기간 합계로 줄임
+        points = points.groupby("time_label", observed=False, as_index=False)["qty"].sum()
+        logger.warning("hourly chart data %d KB over %d KB limit; collapsed to range total", size // 1024, limit // 1024)
+        size = chart_data_bytes(points)
     st.subheader(t(locale, "hourly_trend"))
-    chart = (
-        alt.Chart(melted)
-        .mark_line(point=True)
-        .encode(x="time_label:N", y="qty:Q")
-        .properties(height=320)
-    )
+    encoding = {"x": alt.X("time_label:O", sort=list(TIME_SLOT.categories)), "y": "qty:Q"}
+    if "day" in points:
+        encoding["color"] = alt.Color("day:N", title=t(locale, "date"))
+    else:
+        st.caption(t(locale, "chart_range_total"))
+    chart = alt.Chart(points).mark_line(point=True).encode(**encoding).properties(height=320)
+    logger.debug("hourly chart: %d points, %d bytes of data", len(points), size)
     st.altair_chart(chart, use_container_width=True)
 
 
-def hourly_detail_grid(locale: str, df: pd.DataFrame, style_order: Optional[list[str]] = None):
-    # Build per-style x time grid including overtime
-    hour_cols = [
-        "t_0830", "t_0930", "t_1000", "t_1130", "t_1330", "t_1430", "t_1530", "t_1630", "t_1730", "t_1800", "overtime",
-    ]
-    present = [c for c in hour_cols if c in df.columns]
-    if not present or "style_number" not in df:
+def hourly_detail_grid(locale: str, grid: pd.DataFrame):
+    # Per-style x time grid including overtime and row total (see load_detail_grid)
+    if grid.empty:
         return
-    m = df.melt(id_vars=["style_number"], value_vars=present, var_name="time", value_name="qty")
-
-    def to_label(x: str) -> str:
-        if x == "overtime":
-            return "OT"
-        t = x.replace("t_", "")
-        return f"{t[:2]}:{t[2:]}"
-
-    m["time_label"] = m["time"].map(to_label)
-    agg = m.groupby(["style_number", "time_label"], as_index=False)["qty"].sum()
-    piv = agg.pivot(index="style_number", columns="time_label", values="qty").fillna(0)
-
-    # Ensure column order
-    order = ["08:30", "09:30", "10:00", "11:30", "13:30", "14:30", "15:30", "16:30", "17:30", "18:00", "OT"]
-    cols = [c for c in order if c in piv.columns]
-    piv = piv.reindex(columns=cols)
-    # Add row total
-    piv["Total"] = piv.sum(axis=1)
+    st.subheader(t(locale, "hourly_detail_by_style"))
+    st.dataframe(grid, use_container_width=True)
 
-    if style_order:
-        top_idx = [s for s in style_order if s in piv.index]
-        if top_idx:
-            piv_top = piv.loc[top_idx]
-            piv_rest = piv.drop(index=top_idx, errors="ignore")
-            piv = pd.concat([piv_top, piv_rest])
 
-    st.subheader(t(locale, "hourly_detail_by_style"))
-    st.dataframe(piv.reset_index(), use_container_width=True)
+VIEW_RENDERERS = {
+    "summary": top_styles_table,
+    "trend": hourly_chart,
+    "detail": hourly_detail_grid,
+}
+
+
+@st.fragment
+def dashboard_views(locale: str, query: dict):
+    # 선택된 뷰만 조회/렌더링; 뷰 전환 시 이 프래그먼트만 다시 실행
+    view = st.segmented_control(
+        t(locale, "view"),
+        options=list(VIEW_LOADERS),
+        format_func=lambda v: t(locale, f"tab_{v}"),
+        default="summary",
+        key="_view",
+        label_visibility="collapsed",
+    ) or "summary"
+    try:
+        data = VIEW_LOADERS[view](**query)
+    except RuntimeError as e:
+        st.error(str(e))
+        return
+    VIEW_RENDERERS[view](locale, data)
+
+
+# 실시간 모드에서 변경 로그(프로세스 내부)를 확인하는 주기(초) — DB 폴링 아님
+LIVE_POLL_SECONDS = 3
+
+
+@st.fragment(run_every=LIVE_POLL_SECONDS)
+def live_watch(seq: int, date_from: str, date_to: str, lines: tuple[str, ...]):
+    # 보고 있는 기간/라인에 변경이 있을 때만 전체 페이지 재실행
+    if changed_since(seq, date_from, date_to, lines):
+        st.rerun()
 
 
 def main():
     locale = get_locale()
+    live = live_enabled()
+    if live:
+        # 페이지는 LISTEN만 수행 (트리거 설치는 python -m app.schema notify)
+        start_listener()
+    # 자주 보는 오늘 캐시 항목을 만료 직전에 백그라운드에서 갱신
+    start_refresher()
+    # 데이터 조회 전에 변경 시퀀스를 기록해 조회 중 들어온 변경도 감지
+    seq = current_seq()
     st.title(t(locale, "app_title"))
     apply_responsive_styles()
 
@@ -256,7 +585,14 @@ def main():
     # Big refresh button centered
     cta = st.button(t(locale, "refresh_today"), use_container_width=True)
     if cta:
-        st.cache_data.clear()
+        # 오늘 변경분만 조회하고 오늘 캐시는 항상 무효화 (다른 세션/리스너가 변경분을 먼저 가져갔을 수 있음, 지난 기간 캐시는 유지)
+        invalidate_schema_cache()
+        try:
+            get_day_frame(today.isoformat()).refresh()
+            get_cache().invalidate_today()
+        except RuntimeError as e:
+            st.error(str(e))
+            return
 
     # 단일 날짜 또는 기간 처리
     if isinstance(date_val, tuple) and len(date_val) == 2:
@@ -268,65 +604,63 @@ def main():
         d_from = d_to = today
 
     try:
-        df = load_data(d_from.isoformat(), d_to.isoformat())
+        options = load_filter_options(d_from.isoformat(), d_to.isoformat())
     except RuntimeError as e:
         st.error(str(e))
         return
 
-    if df.empty:
+    if not any(options.values()):
         st.info(t(locale, "no_data"))
         return
 
-    # 동적 필터 옵션 및 적용 (클라이언트 필터링)
+    # 동적 필터 옵션 (기간 내 DISTINCT 값만 조회)
     with st.sidebar:
         st.markdown("---")
         st.caption(t(locale, "filters"))
-        line_opts = sorted(df["line"].dropna().unique().tolist()) if "line" in df else []
-        sel_lines = st.multiselect(t(locale, "line"), options=line_opts)
-        cat_opts = sorted(df["category"].dropna().unique().tolist()) if "category" in df else []
-        sel_cats = st.multiselect(t(locale, "category"), options=cat_opts)
+        sel_lines = st.multiselect(t(locale, "line"), options=options.get("line", []))
+        sel_cats = st.multiselect(t(locale, "category"), options=options.get("category", []))
 
         # 스타일 번호 선택 옵션 추가
-        style_opts = sorted(df["style_number"].dropna().unique().tolist()) if "style_number" in df else []
-        sel_styles = st.multiselect(t(locale, "style"), options=style_opts)
+        sel_styles = st.multiselect(t(locale, "style"), options=options.get("style_number", []))
 
         # 스타일 텍스트 검색 (기존 기능 유지)
         style_like = st.text_input(t(locale, "style_search"), placeholder="Search style...")
 
-    # 선택된 필터 적용
-    if sel_lines:
-        df = df[df["line"].isin(sel_lines)]
-    if sel_cats and "category" in df:
-        df = df[df["category"].isin(sel_cats)]
-
-    # 스타일 필터 적용 (선택 또는 검색)
-    if sel_styles:
-        df = df[df["style_number"].isin(sel_styles)]
-    elif style_like:  # 선택된 스타일이 없을 때만 텍스트 검색 적용
-        df = df[df["style_number"].str.contains(style_like, case=False, na=False)]
-
-    kpi_cards(locale, df)
-    overview_tab, trend_tab, detail_tab = st.tabs([
-        t(locale, "tab_summary"),
-        t(locale, "tab_trend"),
-        t(locale, "tab_detail"),
-    ])
-
-    top_styles: list[str] = []
-    with overview_tab:
-        top_styles = top_styles_table(locale, df)
-    with trend_tab:
-        hourly_chart(locale, df)
-    with detail_tab:
-        hourly_detail_grid(locale, df, style_order=top_styles)
+    # 선택된 필터를 서버 쿼리에 적용 (스타일 선택이 있으면 텍스트 검색보다 우선)
+    query = dict(
+        date_from=d_from.isoformat(), date_to=d_to.isoformat(),
+        lines=tuple(sel_lines), cats=tuple(sel_cats), styles=tuple(sel_styles), style_like=style_like.strip(),
+    )
+    try:
+        data = load_dashboard(**query)
+    except RuntimeError as e:
+        st.error(str(e))
+        return
+
+    kpis = data["kpis"]
+    if not kpis["row_count"]:
+        st.info(t(locale, "no_data"))
+        return
+
+    # KPI/Top/시간대 집계는 서버에서 계산된 작은 결과만 사용
+    kpi_cards(locale, kpis)
+    dashboard_views(locale, query)
+
+    if live:
+        live_watch(seq, query["date_from"], query["date_to"], query["lines"])
 
     # CSV Download
-    csv = df.to_csv(index=False).encode("utf-8-sig")
     if d_from == d_to:
         fname = f"production_{d_from.isoformat()}.csv"
     else:
         fname = f"production_{d_from.isoformat()}_to_{d_to.isoformat()}.csv"
-    st.download_button(t(locale, "download_csv"), data=csv, file_name=fname, mime="text/csv")
+    # 클릭 시에만 CSV 생성 (리런마다 직렬화하지 않음)
+    st.download_button(
+        t(locale, "download_csv"),
+        data=lambda: build_csv(query, kpis["row_count"]),
+        file_name=fname,
+        mime="text/csv",
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,12 @@
+import pytest
+
+from app import db
+
+
+@pytest.fixture(scope="session")
+def database():
+    try:
+        with db.get_engine().connect():
+            pass
+    except Exception as e:
+        pytest.skip(f"database not reachable: {e}")
@@ -0,0 +1,153 @@
+import datetime as dt
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from app import cache as cache_mod
+from app.cache import ResultCache, SingleFlight, cached_by_day, cached_query
+
+
+@pytest.fixture
+def cache(monkeypatch) -> ResultCache:
+    cache = ResultCache()
+    monkeypatch.setattr(cache_mod, "get_cache", lambda: cache)
+    return cache
+
+
+def test_refresh_recomputes_nested_today_loaders(cache):
+    source = {"value": 0}
+
+    @cached_by_day
+    def rows(date_from, date_to=None):
+        return pd.DataFrame({"production_date": [date_from], "qty": [source["value"]]})
+
+    @cached_query
+    def inner(date_from, date_to=None):
+        return int(rows(date_from, date_to)["qty"].sum())
+
+    @cached_query
+    def outer(date_from, date_to=None):
+        return inner(date_from, date_to) * 10
+
+    today = dt.date.today().isoformat()
+    assert outer(today) == 0
+    assert outer(today) == 0  # hit: marks the entry hot
+    source["value"] = 1
+    assert cache.refresh_due(ahead=cache.today_ttl, hot_window=60) >= 1
+    assert outer(today) == 10
+    assert inner(today) == 1
+
+
+def test_refresh_keeps_nested_history_entries(cache):
+    calls = {"history": 0}
+    yesterday = (dt.date.today() - dt.timedelta(days=1)).isoformat()
+    today = dt.date.today().isoformat()
+
+    @cached_query
+    def history(date_from, date_to=None):
+        calls["history"] += 1
+        return 5
+
+    @cached_query
+    def combined(date_from, date_to=None):
+        return history(yesterday, yesterday) + 1
+
+    combined(today)
+    combined(today)
+    cache.refresh_due(ahead=cache.today_ttl, hot_window=60)
+    assert calls["history"] == 1
+
+
+def test_cached_by_day_fetches_only_missing_runs(cache):
+    calls = []
+    lines = {"2020-01-01": "L1", "2020-01-02": "L2", "2020-01-03": "L1", "2020-01-06": "L3"}  # no rows on 04/05
+
+    @cached_by_day
+    def rows(date_from, date_to=None, line=None):
+        calls.append((date_from, date_to, line))
+        days = [d for d in sorted(lines) if date_from <= d <= date_to and line in (None, lines[d])]
+        return pd.DataFrame({
+            "production_date": pd.to_datetime(days),
+            "line": pd.Categorical([lines[d] for d in days]),
+            "qty": pd.array(range(len(days)), dtype="Int16"),
+        })
+
+    assert len(rows("2020-01-02", "2020-01-03")) == 2
+    assert calls == [("2020-01-02", "2020-01-03", None)]
+
+    calls.clear()
+    wide = rows("2020-01-01", "2020-01-06")
+    # One query per contiguous run of uncached days
+    assert calls == [("2020-01-01", "2020-01-01", None), ("2020-01-04", "2020-01-06", None)]
+    assert wide["production_date"].dt.strftime("%Y-%m-%d").tolist() == [
+        "2020-01-01", "2020-01-02", "2020-01-03", "2020-01-06"]
+    # Each day carried its own categories; the concatenated column is categorical again
+    assert isinstance(wide["line"].dtype, pd.CategoricalDtype)
+    assert wide["line"].tolist() == ["L1", "L2", "L1", "L3"]
+    assert str(wide["qty"].dtype) == "Int16"
+
+    calls.clear()
+    pd.testing.assert_frame_equal(rows("2020-01-01", "2020-01-06"), wide)
+    assert rows("2020-01-04", "2020-01-05").empty  # days without rows are cached too
+    assert calls == []
+
+    # Other arguments are part of the key
+    assert rows("2020-01-01", "2020-01-03", line="L1")["line"].tolist() == ["L1", "L1"]
+    assert calls == [("2020-01-01", "2020-01-03", "L1")]
+
+
+def _run_concurrently(flight: SingleFlight, fn, callers: int = 8) -> list:
+    """Run ``callers`` flight.do("k", fn) calls, releasing the leader once the rest are waiting."""
+    release = threading.Event()
+
+    def leader_fn():
+        release.wait(5)
+        return fn()
+
+    with ThreadPoolExecutor(callers) as pool:
+        futures = [pool.submit(flight.do, "k", leader_fn) for _ in range(callers)]
+        deadline = time.monotonic() + 5
+        while flight.stats()["coalesced"] < callers - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        outcomes = []
+        for f in futures:
+            try:
+                outcomes.append(f.result(5))
+            except Exception as e:
+                outcomes.append(e)
+    return outcomes
+
+
+def test_single_flight_runs_once_for_concurrent_callers():
+    flight = SingleFlight()
+    runs = []
+    outcomes = _run_concurrently(flight, lambda: runs.append(1) or object())
+    assert len(runs) == 1
+    assert all(o is outcomes[0] for o in outcomes)
+    assert flight.stats() == {"calls": 8, "coalesced": 7, "executed": 1, "in_flight": 0, "max_waiters": 7}
+
+
+def _fail():
+    raise ValueError("boom")
+
+
+def test_single_flight_error_reaches_every_waiter():
+    flight = SingleFlight()
+    outcomes = _run_concurrently(flight, _fail)
+    assert all(isinstance(o, ValueError) for o in outcomes)
+    assert flight.stats()["executed"] == 1
+
+
+def test_single_flight_releases_the_key():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("k", _fail)
+    assert flight.stats()["in_flight"] == 0
+    # Later calls run again instead of replaying the earlier result or error
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2
+    assert flight.stats() == {"calls": 3, "coalesced": 0, "executed": 3, "in_flight": 0, "max_waiters": 0}
@@ -0,0 +1,97 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import text
+
+from app import db
+from app.db import HOUR_COLUMNS, _build_filters, compact_frame, daily_kpis_arrow, hourly_totals_arrow, memory_report
+
+D1, D2 = dt.date(2020, 1, 1), dt.date(2020, 1, 2)
+
+
+def _table() -> pa.Table:
+    columns = {
+        "production_date": pa.array([D2, D1, D1], pa.date32()),
+        "daily_production_total": pa.array([5, 3, None], pa.int32()),
+        "average_hourly": pa.array([1.5, None, 2.0], pa.float64()),
+    }
+    for i, c in enumerate(HOUR_COLUMNS):
+        columns[c] = pa.array([i, 1, None], pa.int32())
+    return pa.table(columns)
+
+
+def test_daily_kpis_arrow():
+    assert daily_kpis_arrow(_table()) == [
+        {"production_date": D1, "row_count": 2, "total_output": 3, "avg_hourly_sum": 2.0, "avg_hourly_n": 1},
+        {"production_date": D2, "row_count": 1, "total_output": 5, "avg_hourly_sum": 1.5, "avg_hourly_n": 1},
+    ]
+    assert daily_kpis_arrow(_table().slice(0, 0)) == []
+
+
+def test_hourly_totals_arrow():
+    rows = hourly_totals_arrow(_table())
+    assert [r["production_date"] for r in rows] == [D1, D2]
+    assert all(rows[0][c] == 1 for c in HOUR_COLUMNS)
+    assert [rows[1][c] for c in HOUR_COLUMNS] == list(range(len(HOUR_COLUMNS)))
+
+
+def test_style_search_escapes_like_wildcards():
+    where, params = _build_filters("2020-01-01", style_like=r"A_1%\\")
+    assert "ILIKE :style ESCAPE '\\'" in where
+    assert params["style"] == r"%A\_1\%\\\\%"
+
+
+def _driver_frame() -> pd.DataFrame:
+    # Shaped like a SELECT * result: object text/dates, int64/float64 numbers, plus a free-text column
+    return pd.DataFrame({
+        "id": np.array([1, 2, 3], dtype=np.int64),
+        "production_date": [D1, D1, D2],
+        "line": ["L1", "L2", "L1"],
+        "category": ["A", "A", None],
+        "style_number": ["S1", "S2", "S1"],
+        "t_0830": [10, None, 30],
+        "daily_production_total": [100, 200, 70000],
+        "average_hourly": [1.5, np.nan, 2.0],
+        "is_rework": [False, True, False],
+        "note": pd.Series(["hello", None, "world"], dtype=object),
+    })
+
+
+def test_compact_frame_dtypes_and_idempotence():
+    out = compact_frame(_driver_frame())
+    assert str(out["id"].dtype) == "int32"
+    assert str(out["production_date"].dtype) == "datetime64[s]"
+    assert all(isinstance(out[c].dtype, pd.CategoricalDtype) for c in ("line", "category", "style_number"))
+    assert str(out["t_0830"].dtype) == "Int16" and out["t_0830"].isna().tolist() == [False, True, False]
+    assert str(out["daily_production_total"].dtype) == "Int32"
+    assert out["note"].tolist() == ["hello", None, "world"]
+    pd.testing.assert_frame_equal(compact_frame(out), out)
+
+
+def test_memory_report_handles_free_text_columns():
+    df = _driver_frame()
+    df["stamp"] = pd.to_datetime(["2020-01-01 08:30", "2020-01-01 09:30", None])
+    report = memory_report(compact_frame(df))
+    assert report["rows"] == 3
+    assert set(report["columns"]) == set(df.columns)
+    assert report["bytes"] == sum(c[0] for c in report["columns"].values())
+    assert report["plain_bytes"] == sum(c[1] for c in report["columns"].values())
+    # Columns compact_frame leaves alone measure the same in both frames
+    for col in ("note", "stamp", "average_hourly"):
+        used, plain, _ = report["columns"][col]
+        assert used == plain, col
+    assert report["columns"]["is_rework"][:2] == (3, 24)
+
+
+def test_lifted_statement_timeout_ends_with_the_transaction(database, monkeypatch):
+    monkeypatch.setenv("PGEXPORTSTATEMENTTIMEOUT", "0")
+    show = text("SHOW statement_timeout")
+    with db._connect() as conn:
+        session = conn.execute(show).scalar()
+        conn.rollback()
+        db._lift_statement_timeout(conn)
+        assert conn.execute(show).scalar() == "0"
+        conn.rollback()
+        assert conn.execute(show).scalar() == session
@@ -0,0 +1,56 @@
+import asyncio
+import datetime as dt
+import sys
+
+import pytest
+
+from app import db, db_async
+
+
+class _DriverError(Exception):
+    def __init__(self, **attrs):
+        super().__init__("driver error")
+        self.__dict__.update(attrs)
+
+
+class _Wrapped(Exception):
+    def __init__(self, orig):
+        super().__init__("wrapped")
+        self.orig = orig
+
+
+@pytest.mark.parametrize("attr", ["pgcode", "sqlstate"])
+def test_translate_error_codes(attr):
+    timed_out = db._translate_error(_Wrapped(_DriverError(**{attr: db._QUERY_CANCELED})), "public.production_data")
+    assert "timed out" in str(timed_out)
+    missing = db._translate_error(_DriverError(**{attr: db._UNDEFINED_TABLE}), "public.production_data")
+    assert "public.production_data" in str(missing)
+    assert db._translate_error(_DriverError(**{attr: "23505"}), "public.production_data") is None
+
+
+def test_run_uses_one_background_loop():
+    async def loop_id():
+        await asyncio.sleep(0)
+        return id(asyncio.get_running_loop())
+
+    assert db_async.run(loop_id(), timeout=5) == db_async.run(loop_id(), timeout=5)
+
+
+def test_missing_async_driver_is_a_clear_error(monkeypatch):
+    monkeypatch.setitem(sys.modules, "asyncpg", None)
+    db_async.get_async_engine.cache_clear()
+    try:
+        with pytest.raises(RuntimeError, match="requirements-async.txt"):
+            db_async.get_async_engine()
+    finally:
+        db_async.get_async_engine.cache_clear()
+
+
+def test_fetch_dashboard_matches_sync_queries(database):
+    pytest.importorskip("asyncpg")
+    date_to = dt.date.today().isoformat()
+    date_from = (dt.date.today() - dt.timedelta(days=6)).isoformat()
+    result = db_async.run(db_async.fetch_dashboard(date_from, date_to), timeout=60)
+    assert set(result) == {"kpis", "top_styles", "hourly_totals", "style_hour_grid"}
+    assert result["kpis"] == db.fetch_kpis(date_from, date_to)
+    assert [dict(r) for r in result["top_styles"]] == [dict(r) for r in db.fetch_top_styles(date_from, date_to)]
@@ -0,0 +1,81 @@
+import datetime as dt
+import os
+
+import pyarrow as pa
+import pytest
+
+from app.disk_cache import DiskDayCache
+
+DAY = "2020-01-01"
+
+
+def _chunk(lines: list[str], start: int) -> pa.Table:
+    # dictionary_encode() gives every chunk its own dictionary, like the multithreaded CSV reader
+    return pa.table({
+        "id": pa.array(range(start, start + len(lines)), pa.int32()),
+        "line": pa.array(lines).dictionary_encode(),
+    })
+
+
+@pytest.fixture
+def multi_chunk() -> pa.Table:
+    table = pa.concat_tables([_chunk(["L1", "L2"], 0), _chunk(["L3", "L1"], 2)])
+    assert table["line"].num_chunks == 2
+    return table
+
+
+@pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+def test_put_get_multi_chunk_dictionaries(tmp_path, multi_chunk, fmt):
+    cache = DiskDayCache(str(tmp_path), fmt=fmt)
+    cache.put(DAY, multi_chunk)
+    table = cache.get(DAY)
+    assert table is not None
+    assert table["line"].to_pylist() == ["L1", "L2", "L3", "L1"]
+    assert table["id"].to_pylist() == [0, 1, 2, 3]
+    # No temp files left next to the day file
+    files = os.listdir(os.path.join(str(tmp_path), "public"))
+    assert not [f for f in files if f.startswith(".")]
+
+
+def test_failed_write_removes_temp_file(tmp_path, monkeypatch, multi_chunk):
+    cache = DiskDayCache(str(tmp_path), fmt="arrow")
+
+    def fail(table, file):
+        open(file, "wb").close()
+        raise pa.ArrowInvalid("boom")
+
+    monkeypatch.setattr(cache, "_write", fail)
+    with pytest.raises(pa.ArrowInvalid):
+        cache.put(DAY, multi_chunk)
+    assert os.listdir(os.path.join(str(tmp_path), "public")) == []
+
+
+def test_format_switch_reads_existing_files(tmp_path, multi_chunk):
+    DiskDayCache(str(tmp_path), fmt="parquet").put(DAY, multi_chunk)
+    cache = DiskDayCache(str(tmp_path), fmt="arrow")
+    table = cache.get(DAY)
+    assert table is not None and table.num_rows == 4
+    # Rewriting the day in the new format replaces the old file
+    cache.put(DAY, multi_chunk)
+    files = sorted(os.listdir(os.path.join(str(tmp_path), "public")))
+    assert files == [f"{DAY}.arrow", "manifest.json"]
+
+
+def test_unreadable_file_is_a_miss(tmp_path, multi_chunk):
+    cache = DiskDayCache(str(tmp_path), fmt="arrow")
+    cache.put(DAY, multi_chunk)
+    with open(os.path.join(str(tmp_path), "public", f"{DAY}.arrow"), "wb") as f:
+        f.write(b"not an arrow file")
+    assert cache.get(DAY) is None
+    assert cache.stats()["days"] == 0
+
+
+def test_recent_days_are_not_stored(tmp_path, multi_chunk):
+    cache = DiskDayCache(str(tmp_path), min_age_days=2)
+    yesterday = (dt.date.today() - dt.timedelta(days=1)).isoformat()
+    older = (dt.date.today() - dt.timedelta(days=2)).isoformat()
+    cache.put(yesterday, multi_chunk)
+    cache.put(older, multi_chunk)
+    assert cache.get(yesterday) is None
+    assert cache.get(older) is not None
+    assert cache.stats()["days"] == 1
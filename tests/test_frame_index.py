@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.frame_index import FrameIndex
+
+STYLES = ["AB-100", "ab-101", "AB-200", "XY_9", "Q", "ab-xb-ab1", None]
+
+
+def _frame(categorical: bool) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    n = 203  # not a multiple of 8, so the packed bitmaps have padding bits
+    frame = pd.DataFrame({
+        "id": np.arange(n),
+        "line": rng.choice(np.array(["L1", "L2", "L3", None], dtype=object), n),
+        "category": rng.choice(np.array(["A", "B", None], dtype=object), n),
+        "style_number": rng.choice(np.array(STYLES, dtype=object), n),
+    })
+    if categorical:
+        for col in ("line", "category", "style_number"):
+            # An unused category must not produce an option or a bitmap
+            frame[col] = pd.Categorical(frame[col], categories=sorted({*frame[col].dropna(), "UNUSED"}))
+    return frame
+
+
+def _reference(frame, lines=(), cats=(), styles=(), style_like=""):
+    keep = pd.Series(True, index=frame.index)
+    if lines:
+        keep &= frame["line"].isin(lines)
+    if cats:
+        keep &= frame["category"].isin(cats)
+    if styles:
+        keep &= frame["style_number"].isin(styles)
+    elif style_like:
+        keep &= frame["style_number"].astype(object).str.contains(style_like, case=False, regex=False, na=False)
+    return frame[keep].reset_index(drop=True)
+
+
+CASES = [
+    {},
+    {"lines": ("L1",)},
+    {"lines": ("L1", "L3"), "cats": ("B",)},
+    {"cats": ("missing",)},
+    {"styles": ("AB-100", "Q")},
+    {"style_like": "ab-1"},          # trigram path, mixed case
+    {"style_like": "AB"},            # shorter than a trigram: full scan
+    {"style_like": "q"},
+    {"style_like": "_"},             # literal, not a wildcard
+    {"style_like": "b-1001"},        # a trigram no style has
+    {"style_like": "AB-AB"},         # every trigram in one style, but not contiguous
+    {"style_like": "nomatch"},
+    {"styles": ("Q",), "style_like": "ab"},  # explicit styles win over the search
+    {"lines": ("L2",), "cats": ("A",), "style_like": "10"},
+]
+
+
+@pytest.mark.parametrize("categorical", [True, False])
+@pytest.mark.parametrize("filters", CASES)
+def test_filter_matches_pandas(categorical, filters):
+    frame = _frame(categorical)
+    got = FrameIndex(frame).filter(**filters)
+    pd.testing.assert_frame_equal(got, _reference(frame, **filters))
+
+
+def test_options_skip_nulls_and_unused_categories():
+    index = FrameIndex(_frame(categorical=True))
+    assert index.options("line") == ["L1", "L2", "L3"]
+    assert index.options("style_number") == sorted(s for s in STYLES if s)
+    assert index.options("missing") == []
+
+
+def test_search_styles_is_case_insensitive_substring():
+    index = FrameIndex(_frame(categorical=True))
+    assert index.search_styles("AB-1") == ["AB-100", "ab-101"]
+    assert index.search_styles("ab") == ["AB-100", "AB-200", "ab-101", "ab-xb-ab1"]
+    assert index.search_styles("b-1001") == []
+    assert index.search_styles("ab-ab") == []
+    assert index.search_styles("xb-ab") == ["ab-xb-ab1"]
+
+
+def test_unfiltered_and_empty_frames():
+    frame = _frame(categorical=False)
+    assert FrameIndex(frame).mask() is None
+    assert FrameIndex(frame).filter() is frame
+    empty = frame.iloc[:0]
+    assert FrameIndex(empty).filter(lines=("L1",), style_like="ab").empty
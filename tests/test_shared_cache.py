@@ -0,0 +1,173 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from app.cache import _MISSING, PARTITION_HISTORY, PARTITION_TODAY, ResultCache
+from app.shared_cache import CacheBackend, DiskBackend, MemoryBackend, RedisBackend, SharedTier
+
+
+@pytest.fixture
+def redis_backend() -> RedisBackend:
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisBackend(fakeredis.FakeRedis())
+
+
+def test_redis_tag_ttl_is_only_extended(redis_backend):
+    client = redis_backend.client
+    redis_backend.set("history", b"h", 24 * 3600, ["day:D"])
+    redis_backend.set("today", b"t", 60, ["day:D"])
+    assert client.pttl("day:D") > 3600 * 1000
+    assert redis_backend.invalidate_tag("day:D") == 2
+    assert client.get("history") is None
+
+
+def test_redis_tag_of_ttl_less_member_does_not_expire(redis_backend):
+    client = redis_backend.client
+    redis_backend.set("forever", b"f", None, ["part:history"])
+    redis_backend.set("short", b"s", 60, ["part:history"])
+    assert client.pttl("part:history") > 365 * 24 * 3600 * 1000
+    assert client.pttl("forever") == -1
+
+
+def test_redis_invalidate_removes_tag(redis_backend):
+    redis_backend.set("k", b"v", 60, ["a", "b"])
+    assert redis_backend.invalidate_tag("a") == 1
+    assert redis_backend.invalidate_tag("a") == 0
+    assert not redis_backend.client.exists("a")
+    # The other tag still lists the (now deleted) key; invalidating it is harmless
+    assert redis_backend.invalidate_tag("b") == 0
+
+
+def test_memory_backend_sweeps_expired_entries_and_tags():
+    backend = MemoryBackend(sweep_interval=0)
+    backend.set("old", b"x", 0.01, ["day:D"])
+    time.sleep(0.02)
+    backend.set("new", b"y", 60, ["day:E"])
+    assert backend.get("old") is None
+    assert set(backend._tags) == {"day:E"}
+    assert backend._bytes == 1
+
+
+def test_memory_backend_caps_size_oldest_first():
+    backend = MemoryBackend(max_bytes=10)
+    for key in "abc":
+        backend.set(key, b"12345", None, ["t"])
+    assert backend.get("a") is None
+    assert backend.get("b") == b"12345" and backend.get("c") == b"12345"
+    assert backend._tags["t"] == {"b", "c"}
+
+
+def test_disk_backend_sweeps_expired_values_and_markers(tmp_path):
+    backend = DiskBackend(str(tmp_path), sweep_interval=0)
+    backend.set("old", b"x", 0.01, ["day:D"])
+    time.sleep(0.02)
+    backend.set("new", b"y", 60, ["day:E"])
+    assert os.listdir(tmp_path / "values") == [backend._name("new") + ".bin"]
+    assert os.listdir(tmp_path / "tags") == [backend._name("day:E")]
+    assert backend.invalidate_tag("day:E") == 1
+    assert backend.get("new") is None
+
+
+def test_disk_backend_repeated_sets_do_not_grow(tmp_path):
+    backend = DiskBackend(str(tmp_path))
+    for _ in range(5):
+        backend.set("k", b"v", 60, ["day:D", "part:today"])
+    assert len(os.listdir(tmp_path / "values")) == 1
+    for tag in ("day:D", "part:today"):
+        assert os.listdir(backend._tag_dir(tag)) == [backend._name("k")]
+
+
+def test_disk_backend_caps_size_oldest_first(tmp_path):
+    # 18 bytes per file (8-byte expiry header)
+    backend = DiskBackend(str(tmp_path), max_bytes=40)
+    for i, key in enumerate("abc"):
+        backend.set(key, b"x" * 10, None)
+        path = backend._path(backend._name(key))
+        os.utime(path, (1000 + i, 1000 + i))
+    assert backend.sweep() == 1
+    assert backend.get("a") is None and backend.get("c") == b"x" * 10
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        CacheBackend()
+
+
+@pytest.fixture(params=["memory", "disk", "redis"])
+def backend(request, tmp_path) -> CacheBackend:
+    if request.param == "memory":
+        return MemoryBackend()
+    if request.param == "disk":
+        return DiskBackend(str(tmp_path))
+    return request.getfixturevalue("redis_backend")
+
+
+def _node(backend: CacheBackend) -> ResultCache:
+    return ResultCache(shared=SharedTier(backend, namespace="test"))
+
+
+def test_nodes_share_cached_frames(backend):
+    frame = pd.DataFrame({
+        "line": pd.Categorical(["L1", "L2"]),
+        "qty": pd.array([3, 4], dtype="Int16"),
+    })
+    a, b = _node(backend), _node(backend)
+    a.put("rows", frame, PARTITION_HISTORY, span=("2020-01-01", "2020-01-01"))
+    a.put("options", {"line": ["L1", "L2"]}, PARTITION_HISTORY)
+    pd.testing.assert_frame_equal(b.get("rows"), frame)
+    assert b.get("options") == {"line": ["L1", "L2"]}
+    assert b.stats()["shared_hits"] == 2
+    # The shared copy keeps partition and span for local invalidation
+    assert b.invalidate_days({"2020-01-01"}) == 1
+
+
+def test_day_invalidation_reaches_other_nodes(backend):
+    a, b = _node(backend), _node(backend)
+    a.put("history", 1, PARTITION_HISTORY, span=("2020-01-01", "2020-01-01"))
+    # A shorter-lived entry tagged with the same day must not hide the history entry
+    a.put("range", 2, PARTITION_TODAY, span=("2020-01-01", "2020-01-02"))
+    b.invalidate_days({"2020-01-01"})
+    c = _node(backend)
+    assert c.get("history") is _MISSING
+    assert c.get("range") is _MISSING
+
+
+def test_today_invalidation_keeps_history(backend):
+    a, b = _node(backend), _node(backend)
+    a.put("history", 1, PARTITION_HISTORY)
+    a.put("today", 2, PARTITION_TODAY)
+    b.invalidate_today()
+    c = _node(backend)
+    assert c.get("today") is _MISSING
+    assert c.get("history") == 1
+
+
+class _BrokenBackend(CacheBackend):
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        raise ConnectionError("down")
+
+    def set(self, key, payload, ttl, tags=()):
+        self.calls += 1
+        raise ConnectionError("down")
+
+    def invalidate_tag(self, tag):
+        self.calls += 1
+        raise ConnectionError("down")
+
+
+def test_backend_failure_is_a_miss_and_bypassed():
+    broken = _BrokenBackend()
+    cache = _node(broken)
+    assert cache.get("k") is _MISSING
+    cache.put("k", 1, PARTITION_HISTORY)
+    assert cache.get("k") == 1
+    assert cache.get("other") is _MISSING
+    # Only the first failure reached the backend; later reads and writes skip it
+    assert broken.calls == 1
+    assert cache.stats()["shared_errors"] == 1